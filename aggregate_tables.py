@@ -0,0 +1,143 @@
+# Definitions of the published aggregate tables, shared by the full aggregation
+# (data_aggregation.py) and the incremental partials store (stats_store.py)
+from data_loading import COUNTY_NAMES, attach_county_names
+
+# Columns of the cleaned data the aggregations read
+AGGREGATION_COLUMNS = ['Geography', 'FIPS', 'Season/Survey Year', 'Dimension Type', 'Dimension',
+                       'Estimate (%)', 'ci_lower', 'ci_upper']
+
+# Estimate statistics published in the one-dimensional tables
+ALL_STATS = ('mean', 'median', 'std', 'min', 'max', 'count')
+
+# name: (group keys, estimate statistics, other (column, func) aggregates)
+# Counties are keyed and counted by FIPS code; their names come from the county_names
+# dimension table
+AGGREGATE_TABLES = {
+    'county_agg': (['FIPS'], ALL_STATS, [
+        ('Season/Survey Year', 'min'), ('Season/Survey Year', 'max')
+    ]),
+    'year_agg': (['Season/Survey Year'], ALL_STATS, [
+        ('FIPS', 'nunique')
+    ]),
+    'dimension_type_agg': (['Dimension Type'], ALL_STATS, [
+        ('FIPS', 'nunique'), ('Season/Survey Year', 'nunique')
+    ]),
+    'dimension_agg': (['Dimension Type', 'Dimension'], ALL_STATS, [
+        ('FIPS', 'nunique'), ('Season/Survey Year', 'nunique')
+    ]),
+    'county_year_agg': (['FIPS', 'Season/Survey Year'], ('mean', 'count'), []),
+    'year_dimension_agg': (['Season/Survey Year', 'Dimension Type'], ('mean', 'count'), []),
+    COUNTY_NAMES: (['FIPS'], (), [('Geography', 'first')]),
+}
+
+# Geographic roll-ups of the cube cells (olap_cube.geo_table) by cube dimensions: the
+# states and regions of geo_hierarchy.py. The national level is year_agg
+GEO_TABLES = {
+    'state_agg': ['state'],
+    'state_year_agg': ['state', 'year'],
+    'census_region_year_agg': ['census_region', 'year'],
+    'hhs_region_year_agg': ['hhs_region', 'year'],
+}
+
+# Tables keyed by county FIPS, published with the names of the county dimension table
+COUNTY_TABLES = [name for name, (keys, _, _) in AGGREGATE_TABLES.items()
+                 if 'FIPS' in keys and name != COUNTY_NAMES]
+
+# Steps of data_aggregation.aggregate_flu_data and the steps each one needs: the
+# cleaned rows, their grain cells (rollup_engine.GrainStats), every published table,
+# the cube cells (olap_cube.py) the geographic roll-ups come from, and the optional
+# partials store (stats_store.py), materialized cube and county tensor (county_tensor.py)
+AGGREGATION_STEPS = {
+    'load': [],
+    'grain_stats': ['load'],
+    COUNTY_NAMES: ['grain_stats'],
+    **{name: ['grain_stats'] + ([COUNTY_NAMES] if name in COUNTY_TABLES else [])
+       for name in AGGREGATE_TABLES if name != COUNTY_NAMES},
+    'cube_cells': ['grain_stats'],
+    **{name: ['cube_cells'] for name in GEO_TABLES},
+    'partials': ['grain_stats'],
+    'cube': ['cube_cells'],
+    'tensor': ['cube_cells'],
+}
+
+# Published column names of the flattened rollup columns
+RENAMES = {
+    'Estimate (%)_mean': 'avg_vaccination_rate',
+    'Estimate (%)_median': 'median_vaccination_rate',
+    'Estimate (%)_std': 'std_vaccination_rate',
+    'Estimate (%)_min': 'min_vaccination_rate',
+    'Estimate (%)_max': 'max_vaccination_rate',
+    'Estimate (%)_count': 'record_count',
+    'ci_lower_mean': 'avg_ci_lower',
+    'ci_upper_mean': 'avg_ci_upper',
+    'Season/Survey Year_min': 'first_year',
+    'Season/Survey Year_max': 'last_year',
+    'Season/Survey Year_nunique': 'year_count',
+    'FIPS_nunique': 'county_count',
+    'Geography_first': 'Geography'
+}
+
+# Published name of an extra percentile column, e.g. p90 -> p90_vaccination_rate
+PERCENTILE_NAME = '{}_vaccination_rate'
+
+# Row order of each published table: (columns, ascending)
+TABLE_ORDER = {
+    'county_agg': (['avg_vaccination_rate'], False),
+    'year_agg': (['Season/Survey Year'], True),
+    'dimension_type_agg': (['avg_vaccination_rate'], False),
+    'dimension_agg': (['Dimension Type', 'avg_vaccination_rate'], [True, False]),
+}
+
+
+def table_spec(name, percentiles=()):
+    """
+    (keys, stats, others) of a published table, with the extra percentiles
+    (e.g. (10, 90)) placed after the median in the tables that publish one
+    """
+    keys, stats_for, others = AGGREGATE_TABLES[name]
+    if percentiles and 'median' in stats_for:
+        at = stats_for.index('median') + 1
+        stats_for = stats_for[:at] + tuple(f'p{int(p)}' for p in percentiles) + stats_for[at:]
+    return keys, stats_for, others
+
+
+def finish_table(name, table, county_names=None):
+    """
+    Round, rename and order a rolled-up table (indexed by its keys) as it is
+    published; county tables get their names from `county_names`, the finished
+    county dimension table
+    """
+    renames = dict(RENAMES)
+    for col in table.columns:
+        stat = col.rsplit('_', 1)[-1]
+        if col not in renames and stat.startswith('p') and stat[1:].isdigit():
+            renames[col] = PERCENTILE_NAME.format(stat)
+    table = table.round(2).rename(columns=renames).reset_index()
+    if name == COUNTY_NAMES:
+        return table[['FIPS', 'Geography']]
+    if name in COUNTY_TABLES:
+        table = attach_county_names(table, county_names)
+    if name in TABLE_ORDER:
+        by, ascending = TABLE_ORDER[name]
+        # Stable, so ties stay in key order however the rows were merged
+        table = table.sort_values(by, ascending=ascending, kind='stable')
+    return table
+
+
+def aggregation_plan(targets):
+    """
+    The steps needed to produce `targets` (names of AGGREGATION_STEPS), each after
+    the steps it needs and in AGGREGATION_STEPS order, so only the named tables and
+    their intermediates are computed
+    """
+    unknown = [name for name in targets if name not in AGGREGATION_STEPS]
+    if unknown:
+        raise ValueError(f"unknown aggregation targets: {', '.join(unknown)}")
+    needed = set()
+    pending = list(targets)
+    while pending:
+        step = pending.pop()
+        if step not in needed:
+            needed.add(step)
+            pending.extend(AGGREGATION_STEPS[step])
+    return [step for step in AGGREGATION_STEPS if step in needed]
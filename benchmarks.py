@@ -0,0 +1,387 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+
+from cleaning_engine import (load_and_clean_flu_data, parse_ci_column, parse_season_column,
+                             read_raw_extract)
+from county_tensor import build_county_tensor
+from data_aggregation import aggregate_flu_data, save_aggregated_data
+from data_loading import AGGREGATED_DIR, CLEANED_STORE, write_cleaned_store
+from olap_cube import FluCube, build_cube_cells
+from rollup_engine import GrainStats
+
+DIMENSIONS = {
+    'Age': ['6 Months - 17 Years', '18-49 Years', '50-64 Years', '>=65 Years', '>=18 Years'],
+    'Race and Ethnicity': ['Hispanic', 'White, Non-Hispanic', 'Black, Non-Hispanic', 'Asian, Non-Hispanic'],
+    '>=18 Years': ['Medical Setting', 'Non-Medical Setting', 'Pharmacy/Store', 'Workplace'],
+}
+# Synthetic cleaned stores are generated and written this many rows at a time
+SYNTHETIC_CHUNK_ROWS = 5_000_000
+
+
+def make_synthetic_raw(n_rows, seed=0, ci_format='to'):
+    """
+    Build a synthetic raw FluVaxView extract with the same columns as Flu_shot.csv.
+
+    ci_format is 'to' ('43.9 to 47.2'), 'dash' ('43.9-47.2') or 'mixed'.
+    """
+    rng = np.random.default_rng(seed)
+    fips = rng.integers(1001, 56045, size=n_rows)
+    years = rng.integers(2009, 2024, size=n_rows)
+    dim_types = np.array(list(DIMENSIONS))
+    dim_type = dim_types[rng.integers(0, len(dim_types), size=n_rows)]
+    dimension = np.array([DIMENSIONS[t][i % len(DIMENSIONS[t])] for t, i in
+                          zip(dim_type, rng.integers(0, 5, size=n_rows))])
+
+    estimate = np.round(rng.uniform(1, 90, size=n_rows), 1)
+    half_width = np.round(rng.uniform(0.5, 10, size=n_rows), 1)
+    lower = np.round(np.clip(estimate - half_width, 0, 100), 1).astype(str)
+    upper = np.round(np.clip(estimate + half_width, 0, 100), 1).astype(str)
+
+    to_form = np.char.add(np.char.add(lower, ' to '), upper)
+    dash_form = np.char.add(np.char.add(lower, '-'), upper)
+    if ci_format == 'to':
+        ci = to_form
+    elif ci_format == 'dash':
+        ci = dash_form
+    else:
+        ci = np.where(rng.random(n_rows) < 0.5, to_form, dash_form)
+    # Sprinkle footnote markers and suppressed estimates like the real file
+    ci = np.where(rng.random(n_rows) < 0.05, np.char.add(ci, ' ‡'), ci).astype(object)
+    ci[rng.random(n_rows) < 0.02] = np.nan
+
+    season = np.where(rng.random(n_rows) < 0.6,
+                      np.char.add(np.char.add(years.astype(str), '-'),
+                                  np.char.zfill(((years + 1) % 100).astype(str), 2)),
+                      years.astype(str))
+
+    return pd.DataFrame({
+        'Vaccine': 'Seasonal Influenza',
+        'Geography Type': 'Counties',
+        'Geography': np.char.add('County ', (fips % 2000).astype(str)),
+        'FIPS': fips,
+        'Season/Survey Year': season,
+        'Month': 5,
+        'Dimension Type': dim_type,
+        'Dimension': dimension,
+        'Estimate (%)': estimate,
+        '95% CI (%)': ci,
+        'Sample Size': rng.integers(20, 2000, size=n_rows).astype(float),
+    })
+
+
+def make_synthetic_cleaned(n_rows, seed=0):
+    """Build synthetic cleaned rows with the columns the aggregations read"""
+    rng = np.random.default_rng(seed)
+    fips = rng.integers(1001, 56045, size=n_rows)
+    dim_types = pd.Categorical([dim_type for dim_type, dims in DIMENSIONS.items() for _ in dims])
+    dimensions = pd.Categorical([dim for dims in DIMENSIONS.values() for dim in dims])
+    pair = rng.integers(0, len(dimensions), size=n_rows)
+    estimate = np.round(rng.uniform(1, 90, size=n_rows), 1)
+    half_width = np.round(rng.uniform(0.5, 10, size=n_rows), 1)
+    return pd.DataFrame({
+        'Geography': pd.Categorical.from_codes(fips % 2000, [f'County {i}' for i in range(2000)]),
+        'FIPS': fips,
+        'Season/Survey Year': rng.integers(2009, 2024, size=n_rows),
+        'Dimension Type': dim_types[pair],
+        'Dimension': dimensions[pair],
+        'Estimate (%)': estimate,
+        'ci_lower': np.round(np.clip(estimate - half_width, 0, 100), 1),
+        'ci_upper': np.round(np.clip(estimate + half_width, 0, 100), 1),
+    })
+
+
+def legacy_parse_ci(ci_string):
+    """Per-row CI parser previously applied by both cleaners (superset of their two forms)"""
+    if pd.isna(ci_string):
+        return np.nan, np.nan
+    ci_clean = str(ci_string).strip()
+    sep = ' to ' if ' to ' in ci_clean else '-'
+    parts = ci_clean.split(sep)
+    if len(parts) == 2:
+        try:
+            return float(parts[0].strip()), float(parts[1].strip().replace('‡', '').strip())
+        except ValueError:
+            return np.nan, np.nan
+    return np.nan, np.nan
+
+
+def legacy_extract_year(year_string):
+    """Per-row season parser previously applied by data_cleaning_improved"""
+    if pd.isna(year_string):
+        return np.nan
+    year_str = str(year_string).strip()
+    if '-' in year_str and len(year_str) > 4:
+        try:
+            return int(year_str.split('-')[0])
+        except ValueError:
+            return np.nan
+    try:
+        return int(year_str)
+    except ValueError:
+        return np.nan
+
+
+def _best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def benchmark_ci_parsing(n_rows=200_000, repeat=3):
+    """Compare the row-wise apply CI parser against the vectorized regex engine"""
+    ci = make_synthetic_raw(n_rows, ci_format='mixed')['95% CI (%)']
+
+    def run_legacy():
+        parsed = ci.apply(legacy_parse_ci)
+        return pd.DataFrame({'ci_lower': [x[0] for x in parsed], 'ci_upper': [x[1] for x in parsed]})
+
+    legacy_time, legacy = _best_of(run_legacy, repeat)
+    vector_time, vectorized = _best_of(lambda: parse_ci_column(ci), repeat)
+
+    pd.testing.assert_frame_equal(legacy, vectorized.reset_index(drop=True))
+    print(f"CI parsing ({n_rows:,} rows): apply {legacy_time:.3f}s, "
+          f"vectorized {vector_time:.3f}s ({legacy_time / vector_time:.1f}x)")
+    return {'apply': legacy_time, 'vectorized': vector_time}
+
+
+def benchmark_season_parsing(n_rows=200_000, repeat=3, scales=(1, 10)):
+    """Compare row-wise extract_year against the vectorized season parser at growing sizes"""
+    results = {}
+    for scale in scales:
+        rows = n_rows * scale
+        season = make_synthetic_raw(rows)['Season/Survey Year']
+
+        legacy_time, legacy = _best_of(lambda: season.apply(legacy_extract_year), repeat)
+        vector_time, parsed = _best_of(lambda: parse_season_column(season), repeat)
+
+        assert (parsed['start_year'].astype('int64') == legacy.astype('int64')).all()
+        print(f"Season parsing ({rows:,} rows): apply {legacy_time:.3f}s, "
+              f"vectorized {vector_time:.3f}s ({legacy_time / vector_time:.1f}x), "
+              f"{vector_time / rows * 1e9:.1f} ns/row")
+        results[rows] = {'apply': legacy_time, 'vectorized': vector_time}
+    return results
+
+
+def _write_scaled_raw(directory, n_rows, scale, source='Flu_shot.csv'):
+    """
+    Write `scale` concatenated copies of the raw extract (or of n_rows synthetic
+    rows when it is not present) as plain, gzip and, where available, zstd CSV.
+    """
+    if os.path.exists(source):
+        with open(source, 'rb') as f:
+            header, body = f.read().split(b'\n', 1)
+    else:
+        header, body = make_synthetic_raw(n_rows).to_csv(index=False).encode().split(b'\n', 1)
+    if not body.endswith(b'\n'):
+        body += b'\n'
+    data = header + b'\n' + body * scale
+
+    paths = {'csv': os.path.join(directory, 'raw.csv')}
+    with open(paths['csv'], 'wb') as f:
+        f.write(data)
+    for codec, suffix in (('gzip', 'gz'), ('zstd', 'zst')):
+        if pa.Codec.is_available(codec):
+            paths[suffix] = os.path.join(directory, f'raw.csv.{suffix}')
+            with pa.CompressedOutputStream(paths[suffix], codec) as out:
+                out.write(data)
+    return paths
+
+
+def benchmark_csv_engines(n_rows=200_000, repeat=3, scale=10):
+    """
+    Compare pandas' C parser with Arrow's multithreaded reader on a 10x-scaled
+    copy of Flu_shot.csv (synthetic rows if the file is not in the working directory),
+    for the raw read alone and for the full clean, on plain and compressed input.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = _write_scaled_raw(directory, n_rows, scale)
+        rows = len(read_raw_extract(paths['csv'], engine='arrow'))
+        print(f"CSV engines ({rows:,} rows, {os.path.getsize(paths['csv']) / 1e6:.0f} MB, "
+              f"{os.cpu_count()} cores):")
+        for kind, path in paths.items():
+            timings = {}
+            for engine in ('pandas', 'arrow'):
+                try:
+                    read_time, _ = _best_of(lambda: read_raw_extract(path, engine=engine), repeat)
+                except ImportError as e:
+                    # pandas needs the zstandard package for .zst input
+                    print(f"  {kind:>4} {engine:>6}: skipped ({e})")
+                    continue
+                clean_time, cleaned = _best_of(
+                    lambda: load_and_clean_flu_data(path, verbose=False, engine=engine), repeat)
+                timings[engine] = {'read': read_time, 'clean': clean_time, 'result': cleaned}
+                print(f"  {kind:>4} {engine:>6}: read {read_time:.3f}s, clean {clean_time:.3f}s")
+
+            if len(timings) == 2:
+                pandas_result = timings['pandas'].pop('result')
+                arrow_result = timings['arrow'].pop('result')
+                pd.testing.assert_frame_equal(pandas_result, arrow_result, check_dtype=False)
+                print(f"       read {timings['pandas']['read'] / timings['arrow']['read']:.1f}x, "
+                      f"clean {timings['pandas']['clean'] / timings['arrow']['clean']:.1f}x faster with arrow")
+            for timing in timings.values():
+                timing.pop('result', None)
+            results[kind] = timings
+    return results
+
+
+def benchmark_parallel_aggregation(n_rows=50_000_000, repeat=1, workers=(1, 2, 4, 8, 16)):
+    """
+    Scaling of the process-pool aggregation (aggregate_flu_data(workers=...)) on a
+    synthetic cleaned store against the serial scan. Every worker count must
+    publish exactly the serial tables.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        store = os.path.join(directory, 'Flu_shot_cleaned')
+        for part, start in enumerate(range(0, n_rows, SYNTHETIC_CHUNK_ROWS)):
+            chunk = make_synthetic_cleaned(min(SYNTHETIC_CHUNK_ROWS, n_rows - start), seed=part)
+            write_cleaned_store(chunk, store, replace=False, part=part)
+
+        serial_time, serial = _best_of(lambda: aggregate_flu_data(store, verbose=False), repeat)
+        print(f"Parallel aggregation ({n_rows:,} rows, {os.cpu_count()} cores): serial {serial_time:.2f}s")
+        results['serial'] = serial_time
+        for count in workers:
+            parallel_time, tables = _best_of(lambda: aggregate_flu_data(store, verbose=False, workers=count),
+                                             repeat)
+            for name, table in serial.items():
+                pd.testing.assert_frame_equal(table, tables[name], check_exact=True)
+            print(f"  {count:>2} workers: {parallel_time:.2f}s ({serial_time / parallel_time:.2f}x)")
+            results[count] = parallel_time
+    return results
+
+
+def benchmark_county_lookups(n_rows=2_000_000, repeat=3, n_counties=500):
+    """
+    Per-county rate series from the long county-year table (one boolean mask per
+    county, as the chart loops do) against O(1) row slices of the dense county
+    tensor (county_tensor.CountyTensor)
+    """
+    cube = FluCube(build_cube_cells(GrainStats(make_synthetic_cleaned(n_rows))))
+    county_year = cube.rollup(['fips', 'year'])
+    tensor = build_county_tensor(cube)
+    rates = tensor.county_year()
+    counties = county_year['FIPS'].unique()[:n_counties]
+
+    def run_masks():
+        return [county_year.loc[county_year['FIPS'] == fips, 'avg_vaccination_rate'].to_numpy()
+                for fips in counties]
+
+    def run_slices():
+        rows = [rates[tensor.fips_index[int(fips)]] for fips in counties]
+        return [row[np.isfinite(row)] for row in rows]
+
+    mask_time, masked = _best_of(run_masks, repeat)
+    slice_time, sliced = _best_of(run_slices, repeat)
+    for expected, row in zip(masked, sliced):
+        np.testing.assert_allclose(row, expected)
+    print(f"County lookups ({len(counties)} of {tensor.shape[0]:,} counties, {len(county_year):,} "
+          f"county-years): masks {mask_time:.3f}s, tensor slices {slice_time:.4f}s "
+          f"({mask_time / slice_time:.0f}x)")
+    return {'masks': mask_time, 'slices': slice_time}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _time_first_requests(script, directory, timeout=120):
+    """
+    Launch a dashboard script in `directory` and time, from process launch, the
+    first served page and the first response of its default tab callback
+    """
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}'
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(repo, script), '--port', str(port)],
+                               cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{script} exited with code {process.returncode}')
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f'{script} did not serve within {timeout}s')
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.01)
+        page = time.perf_counter() - start
+        payload = {
+            'output': 'tab-content.children',
+            'outputs': {'id': 'tab-content', 'property': 'children'},
+            'inputs': [{'id': 'tabs', 'property': 'active_tab', 'value': 'national'}],
+            'changedPropIds': ['tabs.active_tab'],
+            'state': [],
+        }
+        request = urllib.request.Request(f'{url}/_dash-update-component', data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(request, timeout=timeout).read()
+        return page, time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def benchmark_cold_start(n_rows=200_000, repeat=3, script='multi_tab_dashboard.py'):
+    """
+    Cold start of the dashboard from process launch to the first served page
+    and the first rendered tab, on a synthetic store and its aggregate tables:
+    once without a data snapshot (which the first request writes) and then from
+    the snapshot, as new workers would start
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        store = os.path.join(directory, CLEANED_STORE)
+        write_cleaned_store(make_synthetic_cleaned(n_rows), store)
+        save_aggregated_data(aggregate_flu_data(store, verbose=False),
+                             os.path.join(directory, AGGREGATED_DIR), verbose=False)
+
+        results = {}
+        print(f"Dashboard cold start ({script}, {n_rows:,} cleaned rows):")
+        for label, runs in (('no snapshot', 1), ('snapshot', repeat)):
+            timings = [_time_first_requests(script, directory) for _ in range(runs)]
+            page, tab = min(t[0] for t in timings), min(t[1] for t in timings)
+            print(f"  {label:>11}: first page {page:.2f}s, first tab {tab:.2f}s")
+            results[label] = {'page': page, 'tab': tab}
+    return results
+
+
+BENCHMARKS = {
+    'ci': benchmark_ci_parsing,
+    'season': benchmark_season_parsing,
+    'csv': benchmark_csv_engines,
+    'parallel': benchmark_parallel_aggregation,
+    'lookups': benchmark_county_lookups,
+    'cold_start': benchmark_cold_start,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pipeline performance benchmarks')
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--rows', type=int, default=None,
+                        help="rows per benchmark (default: each benchmark's own, 50M for 'parallel')")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](**({} if args.rows is None else {'n_rows': args.rows}))
@@ -0,0 +1,555 @@
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from datetime import datetime, timezone
+
+import pandas as pd
+import numpy as np
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_loading import CLEANED_STORE, CSV_ENGINES, read_csv_arrow, write_cleaned_store
+from pipeline_report import PipelineReport
+
+# Raw extracts are read as text so that dtype inference cannot differ between a
+# whole-file read and a chunked read; the cleaner types the columns it knows about
+RAW_READ_OPTIONS = {'dtype': str}
+
+# Rows missing any of these after parsing are dropped
+KEY_COLUMNS = ['Estimate (%)', 'ci_lower', 'ci_upper', 'Season/Survey Year']
+
+# Reason recorded for a dropped row, by the first key column it is missing
+DROP_REASONS = {
+    'Estimate (%)': 'missing_estimate',
+    'ci_lower': 'unparsed_ci',
+    'ci_upper': 'unparsed_ci',
+    'Season/Survey Year': 'unparsed_season',
+}
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Format detection looks at the start of each file only
+FORMAT_SAMPLE_BYTES = 64 * 1024
+SNIFF_DELIMITERS = ',\t;|'
+
+# Record of the raw seasons already cleaned into a store, kept inside the store
+# directory (pyarrow skips files starting with '_' when reading the dataset)
+MANIFEST_NAME = '_manifest.json'
+
+# Footnote markers CDC appends to estimates and intervals (e.g. '40.2 to 75.2 ‡')
+FOOTNOTE_MARKERS = '‡†*'
+
+_MARKERS = f'[\\s{FOOTNOTE_MARKERS}]*'
+
+
+def _number(name):
+    return f'(?P<{name}>\\d+(?:\\.\\d*)?|\\.\\d+)'
+
+
+# Matches both '45.2-67.8' / '45.2 - 67.8' and '43.9 to 47.2', with optional footnote markers
+CI_PATTERN = (f'^{_MARKERS}{_number("ci_lower")}{_MARKERS}(?:-|to)'
+              f'{_MARKERS}{_number("ci_upper")}{_MARKERS}$')
+
+# Matches season ranges ('2009-10', '2009-2010', '2009/10') and plain years ('2018')
+SEASON_PATTERN = r'^\s*(?P<start_year>\d{4})(?:\.0+)?(?:\s*[-/]\s*(?P<end_year>\d{4}|\d{2}))?\s*$'
+
+
+def _extract_numbers(series, pattern, dtype='float64'):
+    """
+    Extract the named groups of `pattern` from a text column and cast them to `dtype`.
+
+    Text columns go through pyarrow's regex kernel, which runs without the Python
+    per-element loop behind pandas' .str.extract; Arrow-backed columns are passed
+    to it without conversion. Anything pyarrow cannot take falls back to pandas'
+    string accessor. Non-matching and missing values become NaN.
+    """
+    text = None
+    if isinstance(series.dtype, pd.ArrowDtype) and pa.types.is_string(series.dtype.pyarrow_dtype):
+        text = series.array.__arrow_array__()
+    elif pd.api.types.is_string_dtype(series):
+        try:
+            text = pa.array(series.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    if text is not None:
+        matches = pc.extract_regex(text, pattern)
+        columns = {}
+        for i, field in enumerate(matches.type):
+            values = pc.struct_field(matches, [i])
+            # Optional groups that did not participate come back as ''
+            values = pc.if_else(pc.equal(values, ''), pa.scalar(None, pa.string()), values)
+            values = pc.cast(values, pa.float64())
+            columns[field.name] = values.to_numpy(zero_copy_only=False)
+        return pd.DataFrame(columns, index=series.index).astype(dtype)
+
+    if not (pd.api.types.is_string_dtype(series) or series.dtype == object):
+        series = series.astype(object)
+    extracted = series.str.extract(pattern)
+    return extracted.replace('', np.nan).astype(dtype)
+
+
+def parse_ci_column(series):
+    """
+    Split a "95% CI (%)" column into lower and upper bounds in one vectorized pass.
+
+    Handles the "a - b" and "a to b" forms and strips footnote markers such as '‡'.
+    Returns a DataFrame with float64 columns 'ci_lower' and 'ci_upper'; strings
+    that do not match either form become NaN.
+    """
+    return _extract_numbers(series, CI_PATTERN)
+
+
+def parse_season_column(series, dtype='Int16'):
+    """
+    Normalize a "Season/Survey Year" column holding any mix of season ranges
+    ('2009-10', '2009-2010') and plain years ('2018') in one vectorized pass.
+
+    Returns a DataFrame with compact integer columns 'start_year' and 'end_year'.
+    Plain years end in the same year; two-digit end years are expanded against
+    the start year's century ('1999-00' -> 2000). Unparseable values become <NA>.
+
+    A release only contains a handful of distinct seasons, so the column is
+    factorized and only the unique labels are parsed; the per-row cost is a
+    hash lookup and a take, which keeps the parser linear in the row count.
+    """
+    codes, uniques = pd.factorize(series)
+    labels = pd.Series(uniques, dtype=object).astype(str)
+    years = _extract_numbers(labels, SEASON_PATTERN)
+
+    start = years['start_year']
+    end = years['end_year']
+    short_end = end < 100
+    end = end.where(~short_end, start - start % 100 + end)
+    end = end.where(~(short_end & (end < start)), end + 100)
+    end = end.fillna(start)
+
+    unique_years = pd.DataFrame({'start_year': start, 'end_year': end}).astype(dtype)
+    # Code -1 marks missing input; route it to an appended all-<NA> row
+    missing_row = pd.DataFrame({'start_year': [pd.NA], 'end_year': [pd.NA]}).astype(dtype)
+    unique_years = pd.concat([unique_years, missing_row], ignore_index=True)
+    codes = np.where(codes < 0, len(uniques), codes)
+
+    result = unique_years.take(codes)
+    result.index = series.index
+    return result
+
+
+def _classify(values, parsed, forms):
+    """Name the form (a key of `forms`, regex -> name) shared by the parsed sample values"""
+    if values.empty:
+        return 'none'
+    if not parsed.any():
+        return 'unknown'
+    found = {name for regex, name in forms.items() if values[parsed].str.contains(regex).any()}
+    return found.pop() if len(found) == 1 else 'mixed'
+
+
+def detect_raw_format(path, sample_bytes=FORMAT_SAMPLE_BYTES):
+    """
+    Detect the layout of a raw extract from a sample at the start of the file.
+
+    Returns a dict with
+    - 'delimiter': the field separator (',', tab, ';' or '|')
+    - 'ci_format': 'to' ('43.9 to 47.2'), 'dash' ('45.2-67.8'), 'mixed', 'none'
+      (no intervals in the sample) or 'unknown' (none of the sample parses)
+    - 'season_format': 'range' ('2009-10'), 'year' ('2018'), 'mixed', 'none' or 'unknown'
+
+    Both interval forms and both season forms go through the same vectorized
+    parsers, so the formats only decide whether the file can be cleaned at all;
+    the delimiter is passed on to the CSV reader.
+    """
+    # Compressed files (.gz, .zst, ...) are decompressed on the fly
+    with pa.input_stream(path, compression='detect') as f:
+        head = f.read(sample_bytes)
+    if len(head) == sample_bytes:
+        # Drop the partial last line
+        head = head[:head.rfind(b'\n') + 1]
+    text = head.decode('utf-8')
+
+    try:
+        delimiter = csv.Sniffer().sniff('\n'.join(text.splitlines()[:20]), delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ','
+    sample = pd.read_csv(io.StringIO(text), sep=delimiter, **RAW_READ_OPTIONS)
+
+    fmt = {'delimiter': delimiter, 'ci_format': 'none', 'season_format': 'none'}
+    if '95% CI (%)' in sample.columns:
+        ci = sample['95% CI (%)'].dropna()
+        parsed = parse_ci_column(ci)['ci_lower'].notna()
+        fmt['ci_format'] = _classify(ci, parsed, {r'\dto|\sto\s': 'to', r'\d\s*-\s*[\d.]': 'dash'})
+    if 'Season/Survey Year' in sample.columns:
+        season = sample['Season/Survey Year'].dropna()
+        parsed = parse_season_column(season)['start_year'].notna().to_numpy()
+        fmt['season_format'] = _classify(season, parsed, {r'\d{4}\s*[-/]': 'range', r'^\s*\d{4}(?:\.0+)?\s*$': 'year'})
+    return fmt
+
+
+def read_raw_extract(path, fmt=None, engine='pandas', **read_options):
+    """
+    Read a raw extract as text with the delimiter detected by detect_raw_format.
+
+    engine='arrow' parses with Arrow's multithreaded reader and returns
+    Arrow-backed string columns, which the regex parsers consume without a copy;
+    extra pandas read options (such as chunksize) need engine='pandas'.
+
+    Raises ValueError when the sample's confidence intervals or seasons match
+    none of the known forms, since every row would otherwise be dropped.
+    """
+    if fmt is None:
+        fmt = detect_raw_format(path)
+    for key, label in (('ci_format', "'95% CI (%)'"), ('season_format', "'Season/Survey Year'")):
+        if fmt[key] == 'unknown':
+            raise ValueError(f"{path}: no {label} value in the first rows matches a known format")
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"engine must be one of {CSV_ENGINES}, got {engine!r}")
+    if engine == 'arrow':
+        if read_options:
+            raise ValueError(f"engine='arrow' does not accept {sorted(read_options)}")
+        return read_csv_arrow(path, fmt['delimiter'], as_text=True, arrow_backed=True)
+    return pd.read_csv(path, sep=fmt['delimiter'], **RAW_READ_OPTIONS, **read_options)
+
+
+def normalize_flu_columns(df):
+    """
+    Type the columns of a raw extract in place:
+    - "Estimate (%)", "Sample Size" and "FIPS" become numeric
+    - "95% CI (%)" is split into ci_lower and ci_upper
+    - "Season/Survey Year" becomes the season's first year, with the end year in season_end_year
+    """
+    df['Estimate (%)'] = pd.to_numeric(df['Estimate (%)'], errors='coerce').astype('float64')
+    if 'Sample Size' in df.columns:
+        df['Sample Size'] = pd.to_numeric(df['Sample Size'], errors='coerce').astype('float64')
+    if 'FIPS' in df.columns:
+        df['FIPS'] = pd.to_numeric(df['FIPS'], errors='coerce').astype('Int64')
+
+    ci_bounds = parse_ci_column(df['95% CI (%)'])
+    df['ci_lower'] = ci_bounds['ci_lower']
+    df['ci_upper'] = ci_bounds['ci_upper']
+
+    seasons = parse_season_column(df['Season/Survey Year'])
+    df['Season/Survey Year'] = seasons['start_year']
+    df['season_end_year'] = seasons['end_year']
+    return df
+
+
+def expand_input_paths(inputs):
+    """
+    Resolve a path, a glob pattern or a list of either into an ordered list of files.
+
+    Patterns expand to their matches in sorted order and lists keep the order
+    given, so the same arguments always produce the same file order.
+    """
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    paths = []
+    for item in inputs:
+        item = os.fspath(item)
+        if any(ch in item for ch in '*?['):
+            matches = sorted(glob.glob(item))
+            if not matches:
+                raise FileNotFoundError(f"No input files match {item!r}")
+            paths.extend(matches)
+        else:
+            paths.append(item)
+    return paths
+
+
+def read_and_normalize(path, engine='pandas'):
+    """Detect a raw extract's format, read it and type its columns (runs inside pool workers)"""
+    fmt = detect_raw_format(path)
+    return normalize_flu_columns(read_raw_extract(path, fmt, engine=engine)), fmt
+
+
+def normalize_flu_files(paths, workers=None, engine='pandas'):
+    """
+    Read and normalize several raw extracts, one file per worker process.
+
+    workers defaults to one per file, capped at the machine's core count;
+    workers=1 (or a single file) runs in this process. Results are concatenated
+    in the order of `paths` regardless of which worker finishes first, so the
+    output is identical to normalizing the concatenated files serially.
+
+    Returns the normalized frame and the detected format of each file.
+    """
+    if workers is None:
+        workers = min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) == 1:
+        results = [read_and_normalize(path, engine) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(partial(read_and_normalize, engine=engine), paths))
+    frames = [df for df, _ in results]
+    formats = [fmt for _, fmt in results]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return df, formats
+
+
+def drop_incomplete_rows(df):
+    """
+    Drop rows missing any key column, like df.dropna(subset=KEY_COLUMNS).
+
+    Also returns {reason: row count} for the dropped rows; each row is counted
+    once, under the first key column (in KEY_COLUMNS order) it is missing.
+    """
+    missing = df[KEY_COLUMNS].isna()
+    dropped = missing.any(axis=1).to_numpy()
+    unexplained = dropped.copy()
+    reasons = {}
+    for col in KEY_COLUMNS:
+        hit = unexplained & missing[col].to_numpy()
+        if hit.any():
+            reason = DROP_REASONS[col]
+            reasons[reason] = reasons.get(reason, 0) + int(hit.sum())
+            unexplained &= ~hit
+    return df[~dropped], reasons
+
+
+def clean_flu_frame(df):
+    """Normalize a raw frame and drop rows missing any key column, without diagnostics"""
+    return normalize_flu_columns(df).dropna(subset=KEY_COLUMNS)
+
+
+def stream_clean_flu_data(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, verbose=True, report=None):
+    """
+    Clean a raw extract chunk by chunk, appending each cleaned chunk to output_path.
+
+    Peak memory is bounded by chunksize rather than by the size of the input.
+    An output_path ending in '.csv' gets a CSV; raw columns are read as text and
+    typed explicitly (RAW_READ_OPTIONS), so it is byte-for-byte identical to
+    cleaning the whole file in memory and writing it with to_csv(index=False).
+    Any other output_path is written as the partitioned Parquet store.
+
+    Timings, row counts and drop reasons go to `report` (a PipelineReport) when
+    one is passed; verbose=False skips the printed summary.
+    """
+    if report is None:
+        report = PipelineReport('clean')
+    fmt = detect_raw_format(input_path)
+    report.add_input(input_path, **fmt)
+
+    rows_in = rows_out = 0
+    reader = read_raw_extract(input_path, fmt=fmt, chunksize=chunksize)
+
+    def clean_chunks():
+        nonlocal rows_in, rows_out
+        for chunk in reader:
+            rows_in += len(chunk)
+            cleaned, reasons = drop_incomplete_rows(normalize_flu_columns(chunk))
+            report.add_dropped(reasons)
+            rows_out += len(cleaned)
+            yield cleaned
+
+    with report.stage('stream') as stage:
+        if output_path.endswith('.csv'):
+            with open(output_path, 'w', newline='') as out:
+                for i, cleaned in enumerate(clean_chunks()):
+                    cleaned.to_csv(out, index=False, header=(i == 0))
+        else:
+            for i, cleaned in enumerate(clean_chunks()):
+                write_cleaned_store(cleaned, output_path, replace=(i == 0), part=i)
+        stage['rows_in'] = rows_in
+        stage['rows_out'] = rows_out
+
+    if verbose:
+        print(f"Streamed {rows_in} rows in chunks of {chunksize}: kept {rows_out}, "
+              f"dropped {rows_in - rows_out}")
+    return {'rows_in': rows_in, 'rows_out': rows_out}
+
+
+def season_fingerprints(raw):
+    """
+    Fingerprint the raw rows of each season in a text-typed raw extract.
+
+    Returns {start_year: (digest, row_count)}. The digest covers the column names
+    and every raw cell of the season's rows in file order, so any added, removed
+    or revised row changes it. Rows whose season cannot be parsed are skipped,
+    since cleaning drops them anyway.
+    """
+    start_years = parse_season_column(raw['Season/Survey Year'])['start_year']
+    row_hashes = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+    header = '\x1f'.join(raw.columns).encode()
+
+    fingerprints = {}
+    valid = start_years.notna().to_numpy()
+    years = start_years.to_numpy(dtype='float64', na_value=np.nan)
+    for year in np.unique(years[valid]):
+        in_season = years == year
+        digest = hashlib.sha1(header)
+        digest.update(row_hashes[in_season].tobytes())
+        fingerprints[int(year)] = (digest.hexdigest(), int(in_season.sum()))
+    return fingerprints
+
+
+def load_manifest(store_path=CLEANED_STORE):
+    """Return the incremental-cleaning manifest of a store, or an empty one"""
+    path = os.path.join(store_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'seasons': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, store_path=CLEANED_STORE):
+    path = os.path.join(store_path, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    # Swap the file in atomically so an interrupted run never leaves a torn manifest
+    os.replace(path + '.tmp', path)
+
+
+def incremental_clean_flu_data(input_path, store_path=CLEANED_STORE, engine='pandas', verbose=True, report=None):
+    """
+    Clean only the seasons of a raw extract that the store has not seen yet.
+
+    Each season's raw rows are fingerprinted and compared with the store's
+    manifest. New seasons, and seasons whose raw rows changed in this release,
+    are cleaned and replace their partitions in the store; unchanged seasons are
+    left untouched, and seasons missing from the input (e.g. a file holding only
+    the latest release) are kept. The manifest is updated after the partitions
+    are written, so an interrupted run just reprocesses those seasons next time.
+
+    Timings, row counts and drop reasons go to `report` (a PipelineReport) when
+    one is passed; verbose=False skips the printed summaries.
+    """
+    if report is None:
+        report = PipelineReport('clean')
+    fmt = detect_raw_format(input_path)
+    report.add_input(input_path, **fmt)
+
+    with report.stage('read') as stage:
+        raw = read_raw_extract(input_path, fmt=fmt, engine=engine)
+        fingerprints = season_fingerprints(raw)
+        stage['rows_out'] = len(raw)
+    manifest = load_manifest(store_path)
+    seen = manifest['seasons']
+
+    changed = [year for year, (digest, _) in fingerprints.items()
+               if seen.get(str(year), {}).get('fingerprint') != digest]
+    if verbose:
+        print(f"Seasons in input: {sorted(fingerprints)}")
+        print(f"Seasons to clean: {sorted(changed)} "
+              f"({len(fingerprints) - len(changed)} unchanged, skipped)")
+
+    rows_in = rows_out = 0
+    if changed:
+        start_years = parse_season_column(raw['Season/Survey Year'])['start_year']
+        new_rows = raw[start_years.isin(changed).to_numpy()]
+        rows_in = len(new_rows)
+        with report.stage('clean', rows_in=rows_in) as stage:
+            cleaned, reasons = drop_incomplete_rows(normalize_flu_columns(new_rows.copy()))
+            stage['rows_out'] = len(cleaned)
+        report.add_dropped(reasons)
+        with report.stage('write', rows_in=len(cleaned)) as stage:
+            # A changed season that cleans to no rows loses its partition instead of keeping stale rows
+            rows_out = write_cleaned_store(cleaned, store_path, years=changed)
+            stage['rows_out'] = rows_out
+
+        processed_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        kept = cleaned['Season/Survey Year'].value_counts()
+        for year in changed:
+            digest, row_count = fingerprints[year]
+            seen[str(year)] = {
+                'fingerprint': digest,
+                'rows_in': row_count,
+                'rows_out': int(kept.get(year, 0)),
+                'source': os.path.basename(input_path),
+                'processed_at': processed_at,
+            }
+        save_manifest(manifest, store_path)
+
+    if verbose:
+        print(f"Cleaned {rows_in} new rows: kept {rows_out}, dropped {rows_in - rows_out}")
+    return {'seasons': sorted(changed), 'rows_in': rows_in, 'rows_out': rows_out}
+
+
+def load_and_clean_flu_data(file_path, workers=None, verbose=True, report=None, engine='pandas'):
+    """
+    Load and clean flu vaccination data according to specifications:
+    - Convert "Estimate (%)" to numeric
+    - Split "95% CI (%)" into ci_lower and ci_upper columns
+    - Ensure "Season/Survey Year" is integer (extract first year from ranges like "2009-10")
+      and keep the season's end year in season_end_year
+    - Drop rows with missing values in key columns
+
+    Each file's delimiter, CI form ('a - b' or 'a to b') and season form
+    ('2009-10' or '2018') are detected from a sample, so exports from either
+    cleaner's era, or a mix of both, go through the same vectorized parsers.
+
+    file_path may be a single file, a glob pattern or a list of files (e.g. one
+    extract per state or season); several files are parsed in a process pool of
+    `workers` processes and concatenated in input order. engine='arrow' parses
+    each file with Arrow's multithreaded CSV reader (gzip/zstd input is
+    decompressed as a stream) instead of pandas' single-threaded C parser.
+
+    With verbose=False none of the diagnostic summaries are computed. Stage
+    timings, row counts and drop reasons are recorded in `report` (a
+    PipelineReport) when one is passed.
+    """
+    if report is None:
+        report = PipelineReport('clean')
+
+    input_files = expand_input_paths(file_path)
+    if verbose:
+        print(f"Loading flu vaccination data from {len(input_files)} file(s)...")
+
+    # Read each file, convert "Estimate (%)" to numeric, split "95% CI (%)" into
+    # ci_lower and ci_upper, and convert "Season/Survey Year" to integer (first year of ranges)
+    if verbose:
+        print("Converting 'Estimate (%)', '95% CI (%)' and 'Season/Survey Year'...")
+    with report.stage('read_and_normalize') as stage:
+        df, formats = normalize_flu_files(input_files, workers=workers, engine=engine)
+        stage['rows_out'] = len(df)
+    for path, fmt in zip(input_files, formats):
+        report.add_input(path, **fmt)
+
+    if verbose:
+        for path, fmt in zip(input_files, formats):
+            print(f"  {path}: delimiter {fmt['delimiter']!r}, CI format '{fmt['ci_format']}', "
+                  f"season format '{fmt['season_format']}'")
+        print(f"Original data shape: {df.shape}")
+        print(f"Columns: {list(df.columns)}")
+
+    # Identify key columns for missing value check
+    key_columns = KEY_COLUMNS
+
+    # Check for missing values before dropping
+    if verbose:
+        print(f"\nMissing values in key columns before cleaning:")
+        for col in key_columns:
+            missing_count = df[col].isna().sum()
+            print(f"  {col}: {missing_count} missing values")
+
+    # Drop rows with missing values in key columns
+    if verbose:
+        print("\nDropping rows with missing values in key columns...")
+    initial_rows = len(df)
+    with report.stage('drop_incomplete', rows_in=initial_rows) as stage:
+        df_clean, drop_reasons = drop_incomplete_rows(df)
+        stage['rows_out'] = len(df_clean)
+    report.add_dropped(drop_reasons)
+    final_rows = len(df_clean)
+    dropped_rows = initial_rows - final_rows
+
+    if verbose:
+        print(f"Dropped {dropped_rows} rows ({dropped_rows/initial_rows*100:.1f}% of data)")
+        print(f"Final data shape: {df_clean.shape}")
+
+        # Display summary statistics
+        print("\nSummary statistics for cleaned data:")
+        print(df_clean[['Estimate (%)', 'ci_lower', 'ci_upper', 'Season/Survey Year']].describe())
+
+        # Check data types
+        print("\nData types after cleaning:")
+        print(df_clean.dtypes)
+
+        # Show sample of cleaned data
+        print("\nSample of cleaned data:")
+        print(df_clean[['Geography', 'Season/Survey Year', 'Estimate (%)', 'ci_lower', 'ci_upper']].head(10))
+
+    return df_clean
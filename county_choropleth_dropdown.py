@@ -2,24 +2,11 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
-INPUT_FILE = 'Flu_shot_cleaned.csv'
-OUTPUT_FILE = 'county_choropleth_dropdown.html'
-
+from county_year import load_county_year
+from data_loading import CLEANED_STORE
 
-def aggregate_county_year(df: pd.DataFrame) -> pd.DataFrame:
-	# Compute per county-year aggregates
-	grp = df.groupby(['Geography', 'FIPS', 'Season/Survey Year'], as_index=False).agg(
-		avg_rate=('Estimate (%)', 'mean'),
-		avg_ci_lower=('ci_lower', 'mean'),
-		avg_ci_upper=('ci_upper', 'mean'),
-		record_count=('Estimate (%)', 'count'),
-		sample_size_nonnull=('Sample Size', lambda s: s.dropna().sum())
-	)
-	# If sample size is missing or zero, fall back to record_count
-	grp['sample_size'] = grp['sample_size_nonnull'].replace(0, np.nan)
-	grp['sample_size'] = grp['sample_size'].fillna(grp['record_count'])
-	grp.drop(columns=['sample_size_nonnull'], inplace=True)
-	return grp
+INPUT_FILE = CLEANED_STORE
+OUTPUT_FILE = 'county_choropleth_dropdown.html'
 
 
 def build_map_with_dropdown(df: pd.DataFrame):
@@ -99,10 +86,8 @@ def build_map_with_dropdown(df: pd.DataFrame):
 
 
 def main():
-	print('Loading cleaned dataset...')
-	df = pd.read_csv(INPUT_FILE)
-	print('Aggregating county-year metrics...')
-	agg = aggregate_county_year(df)
+	print('Loading county-year metrics...')
+	agg = load_county_year(INPUT_FILE)
 	print(f'Years: {sorted(agg["Season/Survey Year"].unique())}')
 	build_map_with_dropdown(agg)
 
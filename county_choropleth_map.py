@@ -1,25 +1,26 @@
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 
+from data_loading import list_aggregate_years, load_aggregate
+from geo_hierarchy import state_of
+
 def create_county_choropleth_map():
     """
     Create choropleth map of counties colored by vaccination rate for most recent year
     """
     
     print("Loading county-year aggregated data...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    print(f"Data shape: {df.shape}")
-    print(f"Years available: {sorted(df['Season/Survey Year'].unique())}")
+    years = list_aggregate_years('county_year_agg')
+    print(f"Years available: {years}")
     
     # Get the most recent year
-    most_recent_year = df['Season/Survey Year'].max()
+    most_recent_year = years[-1]
     print(f"Most recent year: {most_recent_year}")
     
-    # Filter data for most recent year
-    recent_data = df[df['Season/Survey Year'] == most_recent_year].copy()
+    # Read only the most recent year's partition
+    recent_data = load_aggregate('county_year_agg', years=[most_recent_year])
+    print(f"Data shape: {recent_data.shape}")
     print(f"Counties in {most_recent_year}: {len(recent_data)}")
     
     # Check FIPS codes
@@ -104,10 +105,9 @@ def create_multi_year_choropleth():
     """
     
     print("\nCreating multi-year choropleth maps...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    # Get recent years (last 5 years with data)
-    recent_years = sorted(df['Season/Survey Year'].unique())[-5:]
+    # Get recent years (last 5 years with data) and read only those partitions
+    recent_years = list_aggregate_years('county_year_agg')[-5:]
+    df = load_aggregate('county_year_agg', years=recent_years)
     print(f"Recent years: {recent_years}")
     
     # Create subplots
@@ -178,28 +178,15 @@ def create_state_level_choropleth():
     """
     
     print("\nCreating state-level choropleth map...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    # Get most recent year
-    most_recent_year = df['Season/Survey Year'].max()
-    recent_data = df[df['Season/Survey Year'] == most_recent_year].copy()
-    
-    # Extract state FIPS (first 2 digits of county FIPS)
-    recent_data['State_FIPS'] = recent_data['FIPS'].astype(str).str[:2].astype(int)
-    
-    # Calculate state averages
-    state_avg = recent_data.groupby('State_FIPS').agg({
-        'avg_vaccination_rate': 'mean',
-        'Geography': 'count'
-    }).reset_index()
-    
-    state_avg.columns = ['State_FIPS', 'avg_vaccination_rate', 'county_count']
+    # State roll-up of the counties' FIPS codes; the map locates states by postal code
+    state_avg = load_aggregate('state_agg').dropna(subset=['Postal'])
     
     print(f"States with data: {len(state_avg)}")
+    print(f"State FIPS range: {state_avg['State_FIPS'].min()} - {state_avg['State_FIPS'].max()}")
     
     # Create state choropleth
     fig = go.Figure(data=go.Choropleth(
-        locations=state_avg['State_FIPS'],
+        locations=state_avg['Postal'],
         z=state_avg['avg_vaccination_rate'],
         locationmode='USA-states',
         colorscale='RdYlGn',
@@ -207,16 +194,21 @@ def create_state_level_choropleth():
         marker_line_color='white',
         marker_line_width=1,
         colorbar_title="Vaccination Rate (%)",
-        hovertemplate='<b>State FIPS: %{location}</b><br>' +
+        text=state_avg['State'],
+        hovertemplate='<b>%{text}</b><br>' +
                      'Vaccination Rate: %{z:.1f}%<br>' +
                      'Counties: %{customdata[0]}<br>' +
-                     'Year: ' + str(most_recent_year) + '<extra></extra>',
-        customdata=state_avg['county_count']
+                     'CI: %{customdata[1]:.1f}% - %{customdata[2]:.1f}%<extra></extra>',
+        customdata=np.column_stack((
+            state_avg['county_count'],
+            state_avg['avg_ci_lower'],
+            state_avg['avg_ci_upper']
+        ))
     ))
     
     fig.update_layout(
         title={
-            'text': f'Flu Vaccination Rates by State - {most_recent_year}<br><sub>State-Level Aggregation</sub>',
+            'text': 'Flu Vaccination Rates by State<br><sub>State-Level Aggregation</sub>',
             'x': 0.5,
             'xanchor': 'center',
             'font': {'size': 18}
@@ -252,11 +244,9 @@ def create_choropleth_with_confidence_intervals():
     """
     
     print("\nCreating choropleth with confidence intervals...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    # Get most recent year
-    most_recent_year = df['Season/Survey Year'].max()
-    recent_data = df[df['Season/Survey Year'] == most_recent_year].copy()
+    # Get most recent year and read only its partition
+    most_recent_year = list_aggregate_years('county_year_agg')[-1]
+    recent_data = load_aggregate('county_year_agg', years=[most_recent_year])
     
     # Create choropleth with confidence interval info in hover
     fig = go.Figure(data=go.Choropleth(
@@ -351,7 +341,7 @@ if __name__ == "__main__":
     print(f"   Average vaccination rate: {recent_data['avg_vaccination_rate'].mean():.1f}%")
     print(f"   Highest rate: {recent_data['avg_vaccination_rate'].max():.1f}%")
     print(f"   Lowest rate: {recent_data['avg_vaccination_rate'].min():.1f}%")
-    print(f"   States represented: {recent_data['FIPS'].astype(str).str[:2].nunique()}")
+    print(f"   States represented: {len(state_of(recent_data['FIPS']).dropna().unique())}")
     
     print("\n" + "="*60)
     print("CHOROPLETH MAPS COMPLETE!")
@@ -1,15 +1,17 @@
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 
+from data_loading import attach_county_names, county_name_table, list_years, load_aggregate, load_cleaned_data
+from geo_hierarchy import state_of
+
 def create_county_choropleth_map():
     """
     Create choropleth map of counties colored by vaccination rate for most recent year
     """
     
     print("Loading county aggregated data...")
-    df = pd.read_csv('aggregated_data/county_agg.csv')
+    df = load_aggregate('county_agg')
     
     print(f"Data shape: {df.shape}")
     print(f"Columns: {df.columns.tolist()}")
@@ -118,30 +120,15 @@ def create_state_level_choropleth():
     """
     
     print("\nCreating state-level choropleth map...")
-    df = pd.read_csv('aggregated_data/county_agg.csv')
-    
-    # Filter counties with FIPS codes
-    df_with_fips = df[df['FIPS'].notna()].copy()
-    
-    # Extract state FIPS (first 2 digits of county FIPS)
-    df_with_fips['State_FIPS'] = df_with_fips['FIPS'].astype(str).str[:2].astype(int)
-    
-    # Calculate state averages
-    state_avg = df_with_fips.groupby('State_FIPS').agg({
-        'avg_vaccination_rate': 'mean',
-        'Geography': 'count',
-        'avg_ci_lower': 'mean',
-        'avg_ci_upper': 'mean'
-    }).reset_index()
-    
-    state_avg.columns = ['State_FIPS', 'avg_vaccination_rate', 'county_count', 'avg_ci_lower', 'avg_ci_upper']
+    # State roll-up of the counties' FIPS codes; the map locates states by postal code
+    state_avg = load_aggregate('state_agg').dropna(subset=['Postal'])
     
     print(f"States with data: {len(state_avg)}")
     print(f"State FIPS range: {state_avg['State_FIPS'].min()} - {state_avg['State_FIPS'].max()}")
     
     # Create state choropleth
     fig = go.Figure(data=go.Choropleth(
-        locations=state_avg['State_FIPS'],
+        locations=state_avg['Postal'],
         z=state_avg['avg_vaccination_rate'],
         locationmode='USA-states',
         colorscale='RdYlGn',
@@ -149,7 +136,8 @@ def create_state_level_choropleth():
         marker_line_color='white',
         marker_line_width=1,
         colorbar_title="Vaccination Rate (%)",
-        hovertemplate='<b>State FIPS: %{location}</b><br>' +
+        text=state_avg['State'],
+        hovertemplate='<b>%{text}</b><br>' +
                      'Vaccination Rate: %{z:.1f}%<br>' +
                      'Counties: %{customdata[0]}<br>' +
                      'CI: %{customdata[1]:.1f}% - %{customdata[2]:.1f}%<extra></extra>',
@@ -198,31 +186,31 @@ def create_choropleth_by_year():
     """
     
     print("\nCreating choropleth maps by year...")
-    df = pd.read_csv('Flu_shot_cleaned.csv')
-    
-    # Get unique years
-    years = sorted(df['Season/Survey Year'].unique())
+    # Get unique years from the store's partitions
+    years = list_years()
     print(f"Available years: {years}")
     
     # Get most recent year
     most_recent_year = years[-1]
     print(f"Most recent year: {most_recent_year}")
     
-    # Filter for most recent year
-    recent_data = df[df['Season/Survey Year'] == most_recent_year].copy()
+    # Read only the most recent year's partition
+    recent_data = load_cleaned_data(['Geography', 'FIPS', 'Season/Survey Year',
+                                     'Estimate (%)', 'ci_lower', 'ci_upper'],
+                                    years=[most_recent_year])
     
     # Calculate county averages for the year
-    county_avg = recent_data.groupby(['Geography', 'FIPS']).agg({
+    county_avg = recent_data.groupby('FIPS', observed=True).agg({
         'Estimate (%)': 'mean',
         'ci_lower': 'mean',
         'ci_upper': 'mean',
         'Season/Survey Year': 'count'
     }).reset_index()
     
-    county_avg.columns = ['Geography', 'FIPS', 'avg_vaccination_rate', 'avg_ci_lower', 'avg_ci_upper', 'record_count']
+    county_avg.columns = ['FIPS', 'avg_vaccination_rate', 'avg_ci_lower', 'avg_ci_upper', 'record_count']
     
-    # Filter counties with FIPS codes
-    county_avg = county_avg[county_avg['FIPS'].notna()].copy()
+    # Counties are keyed by FIPS (rows without one are dropped); names come from the dimension table
+    county_avg = attach_county_names(county_avg, county_name_table(recent_data))
     
     print(f"Counties with data in {most_recent_year}: {len(county_avg)}")
     
@@ -288,7 +276,7 @@ def create_choropleth_with_quantiles():
     """
     
     print("\nCreating choropleth with quantile-based scaling...")
-    df = pd.read_csv('aggregated_data/county_agg.csv')
+    df = load_aggregate('county_agg')
     
     # Filter counties with FIPS codes
     df_with_fips = df[df['FIPS'].notna()].copy()
@@ -396,7 +384,7 @@ if __name__ == "__main__":
     print(f"   Average vaccination rate: {recent_data['avg_vaccination_rate'].mean():.1f}%")
     print(f"   Highest rate: {recent_data['avg_vaccination_rate'].max():.1f}%")
     print(f"   Lowest rate: {recent_data['avg_vaccination_rate'].min():.1f}%")
-    print(f"   States represented: {recent_data['FIPS'].astype(str).str[:2].nunique()}")
+    print(f"   States represented: {len(state_of(recent_data['FIPS']).dropna().unique())}")
     
     print("\n" + "="*60)
     print("CHOROPLETH MAPS COMPLETE!")
@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loading import AGGREGATED_DIR, YEAR_COLUMN, county_name_table
+from olap_cube import load_cube
+
+# Directory of the materialized tensor: one .npy file per measure plus the index maps
+TENSOR_DIR = os.path.join(AGGREGATED_DIR, 'tensor')
+INDEX_FILE = 'index.json'
+# Tensor measures and the cube roll-up columns they come from
+MEASURES = {
+    'rate': 'avg_vaccination_rate',
+    'ci_lower': 'avg_ci_lower',
+    'ci_upper': 'avg_ci_upper',
+    'count': 'record_count',
+}
+
+
+class CountyTensor:
+    """
+    Dense (county, year, dimension) arrays of the county measures: rate,
+    ci_lower and ci_upper (float32, NaN where a county has no rows for a year
+    and dimension) and count (int32, 0 there).
+
+    Counties, years and dimensions ((dimension type, dimension) pairs) are the
+    sorted axis labels; fips_index, year_index and dimension_index map a label
+    to its position, so a county's series is a slice instead of a mask over
+    the long-format tables:
+
+        tensor = load_county_tensor()
+        rates = tensor.county(6037)                  # (year, dimension)
+        trends = tensor.county_year()                # (county, year)
+        gap = trends - np.nanmean(trends, axis=0)    # vs the national mean
+    """
+
+    def __init__(self, arrays, fips, years, dimensions, names):
+        self.arrays = arrays
+        self.fips = np.asarray(fips, dtype='int64')
+        self.years = np.asarray(years, dtype='int64')
+        self.dimensions = [tuple(d) for d in dimensions]
+        # County names aligned with the county axis (None where unknown)
+        self.names = list(names)
+        self.fips_index = {int(f): i for i, f in enumerate(self.fips)}
+        self.year_index = {int(y): i for i, y in enumerate(self.years)}
+        self.dimension_index = {d: i for i, d in enumerate(self.dimensions)}
+
+    @property
+    def shape(self):
+        return self.arrays['rate'].shape
+
+    def __getitem__(self, measure):
+        return self.arrays[measure]
+
+    def county(self, fips, measure='rate'):
+        """(year, dimension) array of one county's measure"""
+        return self.arrays[measure][self.fips_index[int(fips)]]
+
+    def county_year(self, measure='rate'):
+        """
+        (county, year) array over all dimensions: summed counts, or the
+        count-weighted means of the rate and interval bounds (NaN where a county
+        has no rows that year)
+        """
+        count = np.asarray(self.arrays['count'], dtype='float64')
+        total = count.sum(axis=2)
+        if measure == 'count':
+            return total.astype('int64')
+        values = np.asarray(self.arrays[measure], dtype='float64')
+        weighted = np.where(count > 0, np.nan_to_num(values) * count, 0).sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return weighted / np.where(total > 0, total, np.nan)
+
+
+def build_county_tensor(cube):
+    """
+    CountyTensor of a cube (olap_cube.FluCube); cells without a FIPS code,
+    dimension type or dimension are left out
+    """
+    table = cube.rollup(['fips', 'year', 'dimension_type', 'dimension'])
+    fips_pos, fips = pd.factorize(table['FIPS'], sort=True)
+    year_pos, years = pd.factorize(table[YEAR_COLUMN], sort=True)
+    pairs = pd.MultiIndex.from_frame(table[['Dimension Type', 'Dimension']].astype(str))
+    dimension_pos, dimensions = pd.factorize(pairs, sort=True)
+    shape = (len(fips), len(years), len(dimensions))
+
+    arrays = {}
+    for measure, col in MEASURES.items():
+        if measure == 'count':
+            array = np.zeros(shape, dtype='int32')
+        else:
+            array = np.full(shape, np.nan, dtype='float32')
+        array[fips_pos, year_pos, dimension_pos] = table[col].to_numpy()
+        arrays[measure] = array
+
+    names = county_name_table(cube.cells).set_index('FIPS')['Geography'].reindex(fips)
+    return CountyTensor(arrays, fips, years, list(dimensions),
+                        [None if pd.isna(name) else str(name) for name in names])
+
+
+def save_county_tensor(tensor, path=TENSOR_DIR):
+    """Write each measure to <path>/<measure>.npy and the axis labels to index.json"""
+    os.makedirs(path, exist_ok=True)
+    for measure, array in tensor.arrays.items():
+        np.save(os.path.join(path, f'{measure}.npy'), array)
+    index = {
+        'fips': tensor.fips.tolist(),
+        'years': tensor.years.tolist(),
+        'dimensions': [list(d) for d in tensor.dimensions],
+        'names': tensor.names,
+    }
+    tmp_path = os.path.join(path, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(path, INDEX_FILE))
+    return tensor.shape
+
+
+def load_county_tensor(path=TENSOR_DIR, mmap_mode='r'):
+    """
+    Load the materialized tensor with its arrays memory-mapped (mmap_mode=None
+    reads them into memory). When it has not been materialized yet
+    (data_aggregation.py writes it), it is built from the cube instead.
+    """
+    if not os.path.exists(os.path.join(path, INDEX_FILE)):
+        return build_county_tensor(load_cube())
+    with open(os.path.join(path, INDEX_FILE)) as f:
+        index = json.load(f)
+    arrays = {measure: np.load(os.path.join(path, f'{measure}.npy'), mmap_mode=mmap_mode)
+              for measure in MEASURES}
+    return CountyTensor(arrays, index['fips'], index['years'], index['dimensions'], index['names'])
@@ -1,9 +1,10 @@
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 
+from data_loading import load_aggregate
+
 def create_county_trends_chart():
     """
     Create line chart showing flu vaccination rates by year for each county
@@ -11,18 +12,19 @@ def create_county_trends_chart():
     """
     
     print("Loading county-year aggregated data...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
+    df = load_aggregate('county_year_agg')
     
     print(f"Data shape: {df.shape}")
     print(f"Years covered: {df['Season/Survey Year'].min()} - {df['Season/Survey Year'].max()}")
-    print(f"Number of counties: {df['Geography'].nunique()}")
+    print(f"Number of counties: {df['FIPS'].nunique()}")
     
-    # Get unique years and counties
+    # Get unique years and counties (keyed by FIPS; names repeat across states)
     years = sorted(df['Season/Survey Year'].unique())
-    counties = df['Geography'].unique()
+    counties = df['FIPS'].unique()
+    names = df.drop_duplicates('FIPS').set_index('FIPS')['Geography']
     
     print(f"Years: {years}")
-    print(f"Sample counties: {counties[:10]}")
+    print(f"Sample counties: {names[counties[:10]].tolist()}")
     
     # Create the main line chart
     fig = go.Figure()
@@ -38,8 +40,9 @@ def create_county_trends_chart():
     # Add lines for each county (limit to first 50 for performance)
     counties_to_plot = counties[:50]  # Limit to first 50 counties for better performance
     
-    for i, county in enumerate(counties_to_plot):
-        county_data = df[df['Geography'] == county].sort_values('Season/Survey Year')
+    for i, fips in enumerate(counties_to_plot):
+        county = names[fips]
+        county_data = df[df['FIPS'] == fips].sort_values('Season/Survey Year')
         
         if len(county_data) > 1:  # Only plot counties with multiple data points
             color = colors[i % len(colors)]
@@ -138,39 +141,44 @@ def create_simplified_county_trends():
     """
     
     print("\nCreating simplified county trends chart...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
+    df = load_aggregate('county_year_agg')
     
     # Calculate average vaccination rate by county
-    county_avg = df.groupby('Geography')['avg_vaccination_rate'].mean().reset_index()
+    county_avg = df.groupby('FIPS').agg(
+        Geography=('Geography', 'first'),
+        avg_vaccination_rate=('avg_vaccination_rate', 'mean')
+    ).reset_index()
     county_avg = county_avg.sort_values('avg_vaccination_rate', ascending=False)
+    names = county_avg.set_index('FIPS')['Geography']
     
     # Select top 10 and bottom 10 counties
-    top_counties = county_avg.head(10)['Geography'].tolist()
-    bottom_counties = county_avg.tail(10)['Geography'].tolist()
+    top_counties = county_avg.head(10)['FIPS'].tolist()
+    bottom_counties = county_avg.tail(10)['FIPS'].tolist()
     selected_counties = top_counties + bottom_counties
     
-    print(f"Top 10 counties: {top_counties}")
-    print(f"Bottom 10 counties: {bottom_counties}")
+    print(f"Top 10 counties: {names[top_counties].tolist()}")
+    print(f"Bottom 10 counties: {names[bottom_counties].tolist()}")
     
     # Filter data for selected counties
-    df_selected = df[df['Geography'].isin(selected_counties)]
+    df_selected = df[df['FIPS'].isin(selected_counties)]
     
     fig = go.Figure()
     
     # Color counties based on performance
-    for county in selected_counties:
-        county_data = df_selected[df_selected['Geography'] == county].sort_values('Season/Survey Year')
+    for fips in selected_counties:
+        county = names[fips]
+        county_data = df_selected[df_selected['FIPS'] == fips].sort_values('Season/Survey Year')
         
         if len(county_data) > 1:
             # Color: green for top performers, red for bottom performers
-            color = 'green' if county in top_counties else 'red'
-            line_style = 'solid' if county in top_counties else 'dash'
+            color = 'green' if fips in top_counties else 'red'
+            line_style = 'solid' if fips in top_counties else 'dash'
             
             fig.add_trace(go.Scatter(
                 x=county_data['Season/Survey Year'],
                 y=county_data['avg_vaccination_rate'],
                 mode='lines+markers',
-                name=f"{county} ({'Top' if county in top_counties else 'Bottom'})",
+                name=f"{county} ({'Top' if fips in top_counties else 'Bottom'})",
                 line=dict(color=color, width=3, dash=line_style),
                 marker=dict(size=5),
                 hovertemplate=f'<b>{county}</b><br>' +
@@ -188,7 +196,7 @@ def create_simplified_county_trends():
                 x=county_data['Season/Survey Year'].tolist() + county_data['Season/Survey Year'].tolist()[::-1],
                 y=county_data['avg_ci_upper'].tolist() + county_data['avg_ci_lower'].tolist()[::-1],
                 fill='tonexty',
-                fillcolor=f'rgba(0, 255, 0, 0.1)' if county in top_counties else 'rgba(255, 0, 0, 0.1)',
+                fillcolor=f'rgba(0, 255, 0, 0.1)' if fips in top_counties else 'rgba(255, 0, 0, 0.1)',
                 line=dict(color='rgba(255,255,255,0)'),
                 hoverinfo="skip",
                 showlegend=False,
@@ -239,26 +247,8 @@ def create_regional_trends():
     """
     
     print("\nCreating regional trends chart...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    # Simple regional grouping based on county names (this is a simplified approach)
-    # In a real analysis, you'd use proper state/region mapping
-    def get_region(county_name):
-        if any(state in county_name for state in ['California', 'Los Angeles', 'San Francisco', 'San Diego']):
-            return 'West Coast'
-        elif any(state in county_name for state in ['New York', 'Connecticut', 'Massachusetts', 'New Jersey']):
-            return 'Northeast'
-        elif any(state in county_name for state in ['Texas', 'Florida', 'Georgia', 'North Carolina']):
-            return 'South'
-        elif any(state in county_name for state in ['Illinois', 'Michigan', 'Ohio', 'Wisconsin']):
-            return 'Midwest'
-        else:
-            return 'Other'
-    
-    df['Region'] = df['Geography'].apply(get_region)
-    
-    # Calculate regional averages
-    regional_avg = df.groupby(['Region', 'Season/Survey Year'])['avg_vaccination_rate'].mean().reset_index()
+    # Census regions of the counties' state FIPS codes, rolled up during aggregation
+    regional_avg = load_aggregate('census_region_year_agg').rename(columns={'Census Region': 'Region'})
     
     fig = go.Figure()
     
@@ -304,30 +294,8 @@ def create_state_level_trends():
     """
     
     print("\nCreating state-level trends chart...")
-    df = pd.read_csv('aggregated_data/county_year_agg.csv')
-    
-    # Extract state from county name (simplified approach)
-    def extract_state(county_name):
-        # This is a simplified approach - in practice you'd use proper FIPS codes
-        if 'California' in county_name or 'Los Angeles' in county_name:
-            return 'California'
-        elif 'Texas' in county_name:
-            return 'Texas'
-        elif 'Florida' in county_name:
-            return 'Florida'
-        elif 'New York' in county_name:
-            return 'New York'
-        elif 'Connecticut' in county_name:
-            return 'Connecticut'
-        elif 'Massachusetts' in county_name:
-            return 'Massachusetts'
-        else:
-            return 'Other States'
-    
-    df['State'] = df['Geography'].apply(extract_state)
-    
-    # Calculate state averages
-    state_avg = df.groupby(['State', 'Season/Survey Year'])['avg_vaccination_rate'].mean().reset_index()
+    # States of the counties' FIPS codes, rolled up during aggregation
+    state_avg = load_aggregate('state_year_agg').dropna(subset=['State'])
     
     fig = go.Figure()
     
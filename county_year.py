@@ -0,0 +1,88 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loading import (AGGREGATED_DIR, CLEANED_STORE, COUNTY_YEAR_COLUMNS, YEAR_COLUMN,
+                          attach_county_names, cleaned_source, county_name_table, load_cleaned_data)
+
+# Cached county-year tables, one Parquet file per input content hash
+COUNTY_YEAR_CACHE = os.path.join(AGGREGATED_DIR, 'cache')
+# Part of the cache key; bump when aggregate_county_year changes its output
+COUNTY_YEAR_VERSION = 1
+
+
+def aggregate_county_year(df):
+    """
+    County-year table of cleaned rows for the maps and scatter plots.
+
+    Grouped by county FIPS and season with names attached from the county
+    dimension table: avg_rate, avg_ci_lower, avg_ci_upper, record_count and
+    sample_size, the summed sample sizes or, where a county-year reports none
+    (or only zeros), its record count.
+    """
+    grouped = df.groupby(['FIPS', YEAR_COLUMN], observed=True)
+    grp = grouped[['Estimate (%)', 'ci_lower', 'ci_upper']].mean()
+    grp.columns = ['avg_rate', 'avg_ci_lower', 'avg_ci_upper']
+    grp['record_count'] = grouped['Estimate (%)'].count()
+    # min_count=1 leaves groups without any sample size missing instead of 0
+    sample_size = grouped['Sample Size'].sum(min_count=1).replace(0, np.nan)
+    grp['sample_size'] = sample_size.fillna(grp['record_count'])
+    return attach_county_names(grp.reset_index(), county_name_table(df))
+
+
+def content_hash(path):
+    """SHA-256 of a file's bytes, or of every file under a directory (with their relative paths)"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(os.path.relpath(os.path.join(root, name), path)
+                       for root, _, names in os.walk(path) for name in names)
+    else:
+        files = ['']
+    for name in files:
+        digest.update(name.encode())
+        with open(os.path.join(path, name) if name else path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_county_year(path=CLEANED_STORE, cache_dir=COUNTY_YEAR_CACHE, verbose=True):
+    """
+    County-year table (aggregate_county_year) of the cleaned data at `path`, a
+    store or CSV.
+
+    The table is cached in `cache_dir` under the content hash of the input
+    load_cleaned_data reads (the CSV when only that exists), so every map and
+    plot of the same cleaned data shares one computation; a changed input gets
+    a new entry and replaces the old one. The cache key is
+    returned as table.attrs['version'], a version of the dataset for caches
+    of what is drawn from it.
+    """
+    key = f'{COUNTY_YEAR_VERSION}-{content_hash(cleaned_source(path))[:16]}'
+    cache_path = os.path.join(cache_dir, f'county_year-{key}.parquet')
+    if os.path.exists(cache_path):
+        if verbose:
+            print(f'Using cached county-year table {cache_path}')
+        table = pd.read_parquet(cache_path)
+        table.attrs['version'] = key
+        return table
+
+    if verbose:
+        print('Aggregating county-year metrics...')
+    table = aggregate_county_year(load_cleaned_data(COUNTY_YEAR_COLUMNS, path=path))
+    os.makedirs(cache_dir, exist_ok=True)
+    # A per-process temporary file, so concurrent builds never write to the same one
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    table.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+    # Only then drop the entries of older inputs; another process may be removing them too
+    for name in os.listdir(cache_dir):
+        if name.startswith('county_year-') and name.endswith('.parquet') and name != os.path.basename(cache_path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+    table.attrs['version'] = key
+    return table
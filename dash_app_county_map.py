@@ -1,55 +1,60 @@
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from dash import Dash, html, dcc, Input, Output
-
-INPUT_FILE = 'Flu_shot_cleaned.csv'
-
-STATE_FIPS_TO_NAME = {
-	'01': 'Alabama', '02': 'Alaska', '04': 'Arizona', '05': 'Arkansas', '06': 'California',
-	'08': 'Colorado', '09': 'Connecticut', '10': 'Delaware', '11': 'District of Columbia',
-	'12': 'Florida', '13': 'Georgia', '15': 'Hawaii', '16': 'Idaho', '17': 'Illinois', '18': 'Indiana',
-	'19': 'Iowa', '20': 'Kansas', '21': 'Kentucky', '22': 'Louisiana', '23': 'Maine', '24': 'Maryland',
-	'25': 'Massachusetts', '26': 'Michigan', '27': 'Minnesota', '28': 'Mississippi', '29': 'Missouri',
-	'30': 'Montana', '31': 'Nebraska', '32': 'Nevada', '33': 'New Hampshire', '34': 'New Jersey',
-	'35': 'New Mexico', '36': 'New York', '37': 'North Carolina', '38': 'North Dakota', '39': 'Ohio',
-	'40': 'Oklahoma', '41': 'Oregon', '42': 'Pennsylvania', '44': 'Rhode Island', '45': 'South Carolina',
-	'46': 'South Dakota', '47': 'Tennessee', '48': 'Texas', '49': 'Utah', '50': 'Vermont', '51': 'Virginia',
-	'53': 'Washington', '54': 'West Virginia', '55': 'Wisconsin', '56': 'Wyoming',
-	'60': 'American Samoa', '66': 'Guam', '69': 'Northern Mariana Islands', '72': 'Puerto Rico', '78': 'U.S. Virgin Islands'
-}
+from dash import Dash, html, dcc, Input, Output, State, Patch, no_update
+
+from county_year import load_county_year
+from data_loading import CLEANED_STORE
+from figure_cache import FigureCache
+from geo_hierarchy import STATES
+
+INPUT_FILE = CLEANED_STORE
+# Memory cap of the serialized map figures kept between callbacks
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+STATE_FIPS_TO_NAME = {f'{fips:02d}': name for fips, name in zip(STATES['State_FIPS'], STATES['State'])}
 
 STATE_OPTIONS = [{'label': 'All States', 'value': 'ALL'}] + [
 	{'label': name, 'value': code} for code, name in sorted(STATE_FIPS_TO_NAME.items(), key=lambda x: x[1])
 ]
 
 
-def aggregate_county_year(df: pd.DataFrame) -> pd.DataFrame:
-	grp = df.groupby(['Geography', 'FIPS', 'Season/Survey Year'], as_index=False).agg(
-		avg_rate=('Estimate (%)', 'mean'),
-		avg_ci_lower=('ci_lower', 'mean'),
-		avg_ci_upper=('ci_upper', 'mean'),
-		record_count=('Estimate (%)', 'count'),
-		sample_size_nonnull=('Sample Size', lambda s: s.dropna().sum())
-	)
-	grp['sample_size'] = grp['sample_size_nonnull'].replace(0, np.nan)
-	grp['sample_size'] = grp['sample_size'].fillna(grp['record_count'])
-	grp.drop(columns=['sample_size_nonnull'], inplace=True)
-	grp['FIPS'] = grp['FIPS'].astype(str).str.zfill(5)
-	grp['STATEFP'] = grp['FIPS'].str[:2]
-	return grp
-
-
-def make_map(ds: pd.DataFrame, title: str) -> go.Figure:
+def build_map_index(df: pd.DataFrame) -> dict:
+	"""Index of the map columns by (state code or 'ALL', year), built once at startup.
+	Every year of a state is drawn over the same counties (all its counties of any
+	year, sorted by FIPS, NaN where a county has no data that year), so switching the
+	year only changes z and customdata. Values are kept at the precision shown on the
+	map. States are contiguous FIPS ranges of the county axis: the entries are views,
+	and a callback looks its counties up instead of scanning every county-year.
+	"""
+	year_col = 'Season/Survey Year'
+	decimals = {'avg_rate': 2, 'avg_ci_lower': 1, 'avg_ci_upper': 1, 'sample_size': 0, 'record_count': 0}
+	wide = df.set_index(['FIPS', year_col])[list(decimals)].astype(float).round(decimals).unstack(year_col).sort_index()
+	fips = wide.index.to_numpy()
+	geography = df.groupby('FIPS')['Geography'].last().reindex(wide.index).to_numpy(dtype=object)
+	states = wide.index.str[:2].to_numpy()
+	bounds = np.r_[0, np.flatnonzero(states[1:] != states[:-1]) + 1, len(fips)]
+	spans = [('ALL', 0, len(fips))] + [(states[start], start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+
+	index = {}
+	for year in sorted(df[year_col].unique()):
+		z = wide[('avg_rate', year)].to_numpy(dtype=float)
+		customdata = np.column_stack([wide[(col, year)].to_numpy(dtype=float) for col in ('avg_ci_lower', 'avg_ci_upper', 'sample_size', 'record_count')])
+		for state, start, end in spans:
+			index[(state, int(year))] = {'FIPS': fips[start:end], 'avg_rate': z[start:end], 'Geography': geography[start:end], 'customdata': customdata[start:end]}
+	return index
+
+
+def make_map(ds: dict, title: str, year: int) -> go.Figure:
 	fig = go.Figure(go.Choropleth(
-		locations=ds['FIPS'], z=ds['avg_rate'], text=ds['Geography'], locationmode='geojson-id',
+		locations=ds['FIPS'], z=list(ds['avg_rate']), text=ds['Geography'], locationmode='geojson-id',
 		colorscale='RdYlGn', reversescale=False, marker_line_color='white', marker_line_width=0.3,
 		zmin=0, zmax=100, colorbar_title='Rate (%)',
-		customdata=np.column_stack((ds['Season/Survey Year'], ds['avg_ci_lower'], ds['avg_ci_upper'], ds['sample_size'], ds['record_count'])),
+		customdata=ds['customdata'].tolist(),
 		hovertemplate='<b>%{text}</b><br>' +
-			'FIPS: %{location}<br>Year: %{customdata[0]}<br>' +
-			'Rate: %{z:.1f}%<br>95% CI: %{customdata[1]:.1f}–%{customdata[2]:.1f}%<br>' +
-			'Sample Size: %{customdata[3]:.0f} (records: %{customdata[4]})<extra></extra>'
+			f'FIPS: %{{location}}<br>Year: {year}<br>' +
+			'Rate: %{z:.1f}%<br>95% CI: %{customdata[0]:.1f}–%{customdata[1]:.1f}%<br>' +
+			'Sample Size: %{customdata[2]:.0f} (records: %{customdata[3]})<extra></extra>'
 	))
 	fig.update_layout(
 		title={'text': title, 'x': 0.5},
@@ -64,9 +69,50 @@ def make_map(ds: pd.DataFrame, title: str) -> go.Figure:
 
 
 # Load and prepare data once
-_df_raw = pd.read_csv(INPUT_FILE)
-_df = aggregate_county_year(_df_raw)
-YEARS = sorted(_df['Season/Survey Year'].unique())
+_df = load_county_year(INPUT_FILE)
+# Content hash of the cleaned data; part of every cached figure's key
+DATA_VERSION = _df.attrs['version']
+_df['FIPS'] = _df['FIPS'].astype(str).str.zfill(5)
+YEARS = [int(y) for y in sorted(_df['Season/Survey Year'].unique())]
+_MAP_INDEX = build_map_index(_df)
+# States without any county
+_NO_COUNTIES = {'FIPS': [], 'avg_rate': [], 'Geography': [], 'customdata': np.empty((0, 4))}
+_FIGURES = FigureCache(FIGURE_CACHE_BYTES)
+
+
+def map_figure(state_code, year):
+	"""The map of one state (or 'ALL') and year, from the figure cache when it was drawn before"""
+	def build():
+		if state_code == 'ALL':
+			title = f'All States – {year}'
+		else:
+			title = f'{STATE_FIPS_TO_NAME.get(state_code, state_code)} – {year}'
+		return make_map(_MAP_INDEX.get((state_code, year), _NO_COUNTIES), title, year)
+	return _FIGURES.get_or_build((state_code, year, DATA_VERSION), build)
+
+
+def map_patch(drawn, state_code, year):
+	"""Partial update from the drawn map (state code, year, data version) to another
+	one: only the trace properties that differ and the title are sent; the geo
+	layout and colorscale stay as they are in the browser, and a year switch within
+	a state keeps its counties and names. A map drawn from another version of the
+	data (a page opened before the server was restarted on new data) is replaced
+	whole, as its traces cannot be rebuilt to diff against.
+	"""
+	if drawn[2:] != [DATA_VERSION]:
+		return map_figure(state_code, year)
+	if drawn[:2] == [state_code, year]:
+		return no_update
+	old = map_figure(*drawn[:2])['data'][0]
+	new_figure = map_figure(state_code, year)
+	new = new_figure['data'][0]
+	patch = Patch()
+	for prop in ('locations', 'text', 'z', 'customdata', 'hovertemplate'):
+		if new.get(prop) != old.get(prop):
+			patch['data'][0][prop] = new.get(prop)
+	patch['layout']['title']['text'] = new_figure['layout']['title']['text']
+	return patch
+
 
 app = Dash(__name__)
 app.title = 'US County Flu Vaccination Map'
@@ -89,35 +135,42 @@ app.layout = html.Div([
 	], style={'display': 'flex', 'flexWrap': 'wrap', 'marginBottom': '12px'}),
 
 	html.Div([
-		html.Div([dcc.Graph(id='map-left')], style={'flex': '1', 'minWidth': '500px', 'marginRight': '8px'}),
-		html.Div([dcc.Graph(id='map-right')], style={'flex': '1', 'minWidth': '500px', 'marginLeft': '8px'}),
-	], style={'display': 'flex', 'flexWrap': 'wrap'})
+		html.Div([dcc.Graph(id='map-left', figure=map_figure('ALL', YEARS[0]))], style={'flex': '1', 'minWidth': '500px', 'marginRight': '8px'}),
+		html.Div([dcc.Graph(id='map-right', figure=map_figure('ALL', YEARS[-1]))], style={'flex': '1', 'minWidth': '500px', 'marginLeft': '8px'}),
+	], style={'display': 'flex', 'flexWrap': 'wrap'}),
+	# (state code, year, data version) each map currently shows; the base of its next partial update
+	dcc.Store(id='map-left-drawn', data=['ALL', YEARS[0], DATA_VERSION]),
+	dcc.Store(id='map-right-drawn', data=['ALL', YEARS[-1], DATA_VERSION]),
 ])
 
 
 @app.callback(
 	Output('map-left', 'figure'),
-	Output('map-right', 'figure'),
+	Output('map-left-drawn', 'data'),
 	Input('state-filter', 'value'),
 	Input('year-left', 'value'),
-	Input('year-right', 'value')
+	State('map-left-drawn', 'data'),
+	prevent_initial_call=True
 )
-def update_maps(state_code, year_left, year_right):
-	if state_code == 'ALL':
-		df_left = _df[_df['Season/Survey Year'] == year_left]
-		df_right = _df[_df['Season/Survey Year'] == year_right]
-		title_left = f'All States – {year_left}'
-		title_right = f'All States – {year_right}'
-	else:
-		df_left = _df[(_df['Season/Survey Year'] == year_left) & (_df['STATEFP'] == state_code)]
-		df_right = _df[(_df['Season/Survey Year'] == year_right) & (_df['STATEFP'] == state_code)]
-		state_name = STATE_FIPS_TO_NAME.get(state_code, state_code)
-		title_left = f'{state_name} – {year_left}'
-		title_right = f'{state_name} – {year_right}'
-
-	fig_left = make_map(df_left, title_left)
-	fig_right = make_map(df_right, title_right)
-	return fig_left, fig_right
+def update_left_map(state_code, year, drawn):
+	return map_patch(drawn, state_code, year), [state_code, year, DATA_VERSION]
+
+
+@app.callback(
+	Output('map-right', 'figure'),
+	Output('map-right-drawn', 'data'),
+	Input('state-filter', 'value'),
+	Input('year-right', 'value'),
+	State('map-right-drawn', 'data'),
+	prevent_initial_call=True
+)
+def update_right_map(state_code, year, drawn):
+	return map_patch(drawn, state_code, year), [state_code, year, DATA_VERSION]
+
+
+@app.server.route('/figure-cache')
+def figure_cache_stats():
+	return _FIGURES.stats()
 
 
 if __name__ == '__main__':
@@ -1,250 +1,340 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import pandas as pd
-import numpy as np
 
-def aggregate_flu_data(file_path):
+from data_loading import (AGGREGATED_DIR, CLEANED_STORE, COUNTY_NAMES, CSV_ENGINES, list_years,
+                          read_cleaned_store, read_csv_arrow, write_aggregate)
+from pipeline_report import PipelineReport
+from aggregate_tables import (AGGREGATE_TABLES, AGGREGATION_COLUMNS, GEO_TABLES, aggregation_plan, finish_table,
+                              table_spec)
+from county_tensor import TENSOR_DIR, build_county_tensor, save_county_tensor
+from olap_cube import FluCube, build_cube_cells, geo_table, load_cube, update_cube, write_cube
+from rollup_engine import SKETCH_BIN_WIDTH, GrainStats
+from stats_store import STATS_STORE, aggregates_from_store, store_bin_width, update_stats_store
+
+# Section headings printed before the tables in verbose runs
+TABLE_HEADINGS = {
+    'county_agg': "1. AGGREGATING BY COUNTY",
+    'year_agg': "2. AGGREGATING BY YEAR",
+    'dimension_type_agg': "3. AGGREGATING BY DIMENSION TYPE",
+    'dimension_agg': "4. AGGREGATING BY SPECIFIC DIMENSIONS",
+    'county_year_agg': "5. CREATING COMBINED AGGREGATIONS FOR VISUALIZATIONS",
+    'state_agg': "6. ROLLING UP STATES AND REGIONS",
+}
+# Every table a full run publishes
+PUBLISHED_TABLES = list(AGGREGATE_TABLES) + list(GEO_TABLES)
+
+def season_stats(years, store_path=CLEANED_STORE, quantile_bin_width=None):
+    """GrainStats of some seasons of the cleaned store; one task of parallel_grain_stats"""
+    df = read_cleaned_store(AGGREGATION_COLUMNS, years=years, store_path=store_path)
+    return GrainStats(df, quantile_bin_width)
+
+def parallel_grain_stats(store_path=CLEANED_STORE, workers=None, quantile_bin_width=None):
+    """
+    GrainStats of the whole cleaned store, with each season partition read and
+    reduced in a pool of `workers` processes. The per-season results are combined
+    exactly (GrainStats.from_parts), so every table equals the serial one.
+    """
+    seasons = [[year] for year in list_years(store_path)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(season_stats, seasons, repeat(store_path), repeat(quantile_bin_width)))
+    return GrainStats.from_parts(parts)
+
+def aggregate_flu_data(file_path, verbose=True, report=None, engine='pandas', stats_store=None,
+                       percentiles=(), quantile_bin_width=None, cube_dir=None, workers=None, tables=None,
+                       tensor_dir=None):
     """
     Aggregate flu vaccination data by:
     1. County (Geography)
     2. Year (Season/Survey Year) 
     3. Dimension Type (Age, Setting, etc.)
+
+    The rows are scanned once into a compact intermediate at the finest grain
+    (rollup_engine.GrainStats) and the tables of aggregate_tables.AGGREGATE_TABLES
+    in the plan are rolled up from its integer codes, so the text keys are hashed
+    once instead of once per table.
+
+    verbose=False skips the printed summaries and samples; per-table timings and
+    row counts go to `report` (a PipelineReport) when one is passed. A cleaned
+    CSV is parsed with `engine` ('pandas' or Arrow's multithreaded 'arrow' reader).
+
+    With `stats_store` (a directory such as stats_store.STATS_STORE) the per-season
+    partials of every table are rebuilt there from the same scan, so later seasons
+    can be merged in with stats_store.update_stats_store.
+
+    `percentiles` (e.g. (10, 90)) adds pNN_vaccination_rate columns next to the
+    medians. With quantile_bin_width (percentage points, e.g. 0.5) medians and
+    percentiles come from a fixed-width histogram sketch and are within half a
+    bin of the exact values; see rollup_engine.snap_to_bins.
+
+    With `cube_dir` the OLAP cube (olap_cube.FluCube) is materialized there from
+    the same scan, for ad-hoc slice and roll-up queries by the visualizations.
+    With `tensor_dir` the dense county x year x dimension arrays
+    (county_tensor.CountyTensor) are saved there as .npy files.
+
+    With `workers` (a process count) the season partitions of the cleaned store
+    are scanned in parallel (see parallel_grain_stats); the tables are identical
+    to the serial ones.
+
+    The state, census region and HHS region roll-ups (aggregate_tables.GEO_TABLES)
+    come from the cube cells, whose geographic hierarchy is derived from the
+    county FIPS codes (geo_hierarchy.py).
+
+    `tables` names the published tables to build (PUBLISHED_TABLES by default);
+    only those and the steps they need are computed
+    (aggregate_tables.aggregation_plan) and only those are returned.
     """
-    
-    print("Loading cleaned flu vaccination data...")
-    df = pd.read_csv(file_path)
-    
-    print(f"Original data shape: {df.shape}")
-    print(f"Available columns: {list(df.columns)}")
-    
-    # Check unique dimension types
-    print(f"\nUnique Dimension Types:")
-    print(df['Dimension Type'].value_counts())
-    
-    # Check unique dimensions within each type
-    print(f"\nSample dimensions by type:")
-    for dim_type in df['Dimension Type'].unique():
-        if pd.notna(dim_type):
-            sample_dims = df[df['Dimension Type'] == dim_type]['Dimension'].unique()[:5]
-            print(f"  {dim_type}: {list(sample_dims)}")
-    
-    # 1. AGGREGATE BY COUNTY
-    print("\n" + "="*50)
-    print("1. AGGREGATING BY COUNTY")
-    print("="*50)
-    
-    county_agg = df.groupby('Geography').agg({
-        'Estimate (%)': ['mean', 'median', 'std', 'min', 'max', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean',
-        'Season/Survey Year': ['min', 'max'],
-        'FIPS': 'first'
-    }).round(2)
-    
-    # Flatten column names
-    county_agg.columns = ['_'.join(col).strip() for col in county_agg.columns]
-    county_agg = county_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_median': 'median_vaccination_rate',
-        'Estimate (%)_std': 'std_vaccination_rate',
-        'Estimate (%)_min': 'min_vaccination_rate',
-        'Estimate (%)_max': 'max_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper',
-        'Season/Survey Year_min': 'first_year',
-        'Season/Survey Year_max': 'last_year',
-        'FIPS_first': 'FIPS'
-    })
-    
-    county_agg = county_agg.reset_index()
-    county_agg = county_agg.sort_values('avg_vaccination_rate', ascending=False)
-    
-    print(f"County aggregation: {len(county_agg)} counties")
-    print("Top 10 counties by average vaccination rate:")
-    print(county_agg[['Geography', 'avg_vaccination_rate', 'record_count']].head(10))
-    
-    # 2. AGGREGATE BY YEAR
-    print("\n" + "="*50)
-    print("2. AGGREGATING BY YEAR")
-    print("="*50)
-    
-    year_agg = df.groupby('Season/Survey Year').agg({
-        'Estimate (%)': ['mean', 'median', 'std', 'min', 'max', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean',
-        'Geography': 'nunique'
-    }).round(2)
-    
-    # Flatten column names
-    year_agg.columns = ['_'.join(col).strip() for col in year_agg.columns]
-    year_agg = year_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_median': 'median_vaccination_rate',
-        'Estimate (%)_std': 'std_vaccination_rate',
-        'Estimate (%)_min': 'min_vaccination_rate',
-        'Estimate (%)_max': 'max_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper',
-        'Geography_nunique': 'county_count'
-    })
-    
-    year_agg = year_agg.reset_index()
-    year_agg = year_agg.sort_values('Season/Survey Year')
-    
-    print(f"Year aggregation: {len(year_agg)} years")
-    print("Yearly trends:")
-    print(year_agg[['Season/Survey Year', 'avg_vaccination_rate', 'county_count', 'record_count']])
-    
-    # 3. AGGREGATE BY DIMENSION TYPE
-    print("\n" + "="*50)
-    print("3. AGGREGATING BY DIMENSION TYPE")
-    print("="*50)
-    
-    # First, aggregate by dimension type
-    dim_type_agg = df.groupby('Dimension Type').agg({
-        'Estimate (%)': ['mean', 'median', 'std', 'min', 'max', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean',
-        'Geography': 'nunique',
-        'Season/Survey Year': 'nunique'
-    }).round(2)
-    
-    # Flatten column names
-    dim_type_agg.columns = ['_'.join(col).strip() for col in dim_type_agg.columns]
-    dim_type_agg = dim_type_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_median': 'median_vaccination_rate',
-        'Estimate (%)_std': 'std_vaccination_rate',
-        'Estimate (%)_min': 'min_vaccination_rate',
-        'Estimate (%)_max': 'max_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper',
-        'Geography_nunique': 'county_count',
-        'Season/Survey Year_nunique': 'year_count'
-    })
-    
-    dim_type_agg = dim_type_agg.reset_index()
-    dim_type_agg = dim_type_agg.sort_values('avg_vaccination_rate', ascending=False)
-    
-    print(f"Dimension type aggregation: {len(dim_type_agg)} dimension types")
-    print("Vaccination rates by dimension type:")
-    print(dim_type_agg[['Dimension Type', 'avg_vaccination_rate', 'record_count']])
-    
-    # 4. AGGREGATE BY DIMENSION (specific categories within each type)
-    print("\n" + "="*50)
-    print("4. AGGREGATING BY SPECIFIC DIMENSIONS")
-    print("="*50)
-    
-    dimension_agg = df.groupby(['Dimension Type', 'Dimension']).agg({
-        'Estimate (%)': ['mean', 'median', 'std', 'min', 'max', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean',
-        'Geography': 'nunique',
-        'Season/Survey Year': 'nunique'
-    }).round(2)
-    
-    # Flatten column names
-    dimension_agg.columns = ['_'.join(col).strip() for col in dimension_agg.columns]
-    dimension_agg = dimension_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_median': 'median_vaccination_rate',
-        'Estimate (%)_std': 'std_vaccination_rate',
-        'Estimate (%)_min': 'min_vaccination_rate',
-        'Estimate (%)_max': 'max_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper',
-        'Geography_nunique': 'county_count',
-        'Season/Survey Year_nunique': 'year_count'
-    })
-    
-    dimension_agg = dimension_agg.reset_index()
-    dimension_agg = dimension_agg.sort_values(['Dimension Type', 'avg_vaccination_rate'], ascending=[True, False])
-    
-    print(f"Specific dimension aggregation: {len(dimension_agg)} dimension combinations")
-    
-    # Show top dimensions by vaccination rate for each type
-    for dim_type in dimension_agg['Dimension Type'].unique():
-        if pd.notna(dim_type):
-            top_dims = dimension_agg[dimension_agg['Dimension Type'] == dim_type].head(5)
-            print(f"\nTop 5 {dim_type} dimensions by vaccination rate:")
-            print(top_dims[['Dimension', 'avg_vaccination_rate', 'record_count']].to_string(index=False))
-    
-    # 5. CREATE COMBINED AGGREGATIONS FOR VISUALIZATIONS
-    print("\n" + "="*50)
-    print("5. CREATING COMBINED AGGREGATIONS FOR VISUALIZATIONS")
-    print("="*50)
-    
-    # County-Year aggregation
-    county_year_agg = df.groupby(['Geography', 'Season/Survey Year']).agg({
-        'Estimate (%)': ['mean', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean'
-    }).round(2)
-    
-    county_year_agg.columns = ['_'.join(col).strip() for col in county_year_agg.columns]
-    county_year_agg = county_year_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper'
-    })
-    county_year_agg = county_year_agg.reset_index()
-    
-    # Year-Dimension Type aggregation
-    year_dim_agg = df.groupby(['Season/Survey Year', 'Dimension Type']).agg({
-        'Estimate (%)': ['mean', 'count'],
-        'ci_lower': 'mean',
-        'ci_upper': 'mean'
-    }).round(2)
-    
-    year_dim_agg.columns = ['_'.join(col).strip() for col in year_dim_agg.columns]
-    year_dim_agg = year_dim_agg.rename(columns={
-        'Estimate (%)_mean': 'avg_vaccination_rate',
-        'Estimate (%)_count': 'record_count',
-        'ci_lower_mean': 'avg_ci_lower',
-        'ci_upper_mean': 'avg_ci_upper'
-    })
-    year_dim_agg = year_dim_agg.reset_index()
-    
-    print(f"County-Year aggregation: {len(county_year_agg)} combinations")
-    print(f"Year-Dimension Type aggregation: {len(year_dim_agg)} combinations")
-    
-    return {
-        'county_agg': county_agg,
-        'year_agg': year_agg,
-        'dimension_type_agg': dim_type_agg,
-        'dimension_agg': dimension_agg,
-        'county_year_agg': county_year_agg,
-        'year_dimension_agg': year_dim_agg
-    }
-
-def save_aggregated_data(aggregations, output_dir='aggregated_data'):
-    """Save all aggregated DataFrames to CSV files"""
+    if report is None:
+        report = PipelineReport('aggregate')
+    
+    targets = list(PUBLISHED_TABLES if tables is None else tables)
+    if stats_store is not None:
+        targets.append('partials')
+    if cube_dir is not None:
+        targets.append('cube')
+    if tensor_dir is not None:
+        targets.append('tensor')
+    plan = aggregation_plan(targets)
+    if not plan:
+        return {}
+    
+    if workers:
+        if file_path.endswith('.csv'):
+            raise ValueError('parallel aggregation reads the season partitions of the cleaned store, not a CSV')
+        if verbose:
+            print(f"Scanning the seasons of {file_path} in {workers} processes...")
+        with report.stage('grain_stats') as stage:
+            stats = parallel_grain_stats(file_path, workers, quantile_bin_width)
+            stage['rows_out'] = len(stats)
+        if verbose:
+            print(f"Original data: {stats.rows} rows in {len(stats)} grain cells")
+    else:
+        if verbose:
+            print("Loading cleaned flu vaccination data...")
+        with report.stage('load') as stage:
+            if file_path.endswith('.csv') and engine == 'arrow':
+                df = read_csv_arrow(file_path, columns=AGGREGATION_COLUMNS)
+            elif file_path.endswith('.csv'):
+                df = pd.read_csv(file_path)
+            else:
+                # Partitioned Parquet store: read only the columns the aggregations use
+                df = read_cleaned_store(AGGREGATION_COLUMNS, store_path=file_path)
+            stage['rows_out'] = len(df)
+        
+        if verbose:
+            print(f"Original data shape: {df.shape}")
+            print(f"Available columns: {list(df.columns)}")
+            
+            # Check unique dimension types
+            print(f"\nUnique Dimension Types:")
+            print(df['Dimension Type'].value_counts())
+            
+            # Check unique dimensions within each type
+            print(f"\nSample dimensions by type:")
+            for dim_type in df['Dimension Type'].unique():
+                if pd.notna(dim_type):
+                    sample_dims = df[df['Dimension Type'] == dim_type]['Dimension'].unique()[:5]
+                    print(f"  {dim_type}: {list(sample_dims)}")
+        
+        # Scan the rows once; every table below is rolled up from this intermediate
+        with report.stage('grain_stats', rows_in=len(df)) as stage:
+            stats = GrainStats(df, quantile_bin_width)
+            stage['rows_out'] = len(stats)
+    
+    if 'partials' in plan:
+        with report.stage('partials', rows_in=len(stats)) as stage:
+            stage['rows_out'] = update_stats_store(store_path=stats_store, stats=stats)
+    
+    if 'cube_cells' in plan:
+        with report.stage('cube_cells', rows_in=len(stats)) as stage:
+            cube = FluCube(build_cube_cells(stats))
+            stage['rows_out'] = len(cube)
+    
+    if 'cube' in plan:
+        with report.stage('cube', rows_in=len(cube)) as stage:
+            stage['rows_out'] = write_cube(cube.cells, cube_dir)
+    
+    if 'tensor' in plan:
+        with report.stage('tensor', rows_in=len(cube)) as stage:
+            tensor = build_county_tensor(cube)
+            save_county_tensor(tensor, tensor_dir)
+            stage['rows_out'] = tensor.shape[0]
+    
+    aggregations = {}
+    for name in plan:
+        if name not in AGGREGATE_TABLES and name not in GEO_TABLES:
+            continue
+        if verbose and name in TABLE_HEADINGS:
+            print("\n" + "="*50)
+            print(TABLE_HEADINGS[name])
+            print("="*50)
+        
+        if name in GEO_TABLES:
+            with report.stage(name, rows_in=len(cube)) as stage:
+                aggregations[name] = geo_table(cube, name)
+                stage['rows_out'] = len(aggregations[name])
+        else:
+            with report.stage(name, rows_in=len(stats)) as stage:
+                aggregations[name] = finish_table(name, stats.rollup(*table_spec(name, percentiles)),
+                                                  aggregations.get(COUNTY_NAMES))
+                stage['rows_out'] = len(aggregations[name])
+        
+        if verbose:
+            print_table_summary(name, aggregations[name])
+    
+    # Intermediate tables (the county names of county tables) are not returned unless asked for
+    return {name: table for name, table in aggregations.items() if name in targets}
+
+def print_table_summary(name, table):
+    """Print the summary and sample rows of one published table"""
+    if name == 'county_agg':
+        print(f"County aggregation: {len(table)} counties")
+        print("Top 10 counties by average vaccination rate:")
+        print(table[['Geography', 'avg_vaccination_rate', 'record_count']].head(10))
+    elif name == 'year_agg':
+        print(f"Year aggregation: {len(table)} years")
+        print("Yearly trends:")
+        print(table[['Season/Survey Year', 'avg_vaccination_rate', 'county_count', 'record_count']])
+    elif name == 'dimension_type_agg':
+        print(f"Dimension type aggregation: {len(table)} dimension types")
+        print("Vaccination rates by dimension type:")
+        print(table[['Dimension Type', 'avg_vaccination_rate', 'record_count']])
+    elif name == 'dimension_agg':
+        print(f"Specific dimension aggregation: {len(table)} dimension combinations")
+        
+        # Show top dimensions by vaccination rate for each type
+        for dim_type in table['Dimension Type'].unique():
+            if pd.notna(dim_type):
+                top_dims = table[table['Dimension Type'] == dim_type].head(5)
+                print(f"\nTop 5 {dim_type} dimensions by vaccination rate:")
+                print(top_dims[['Dimension', 'avg_vaccination_rate', 'record_count']].to_string(index=False))
+    elif name == 'county_year_agg':
+        print(f"County-Year aggregation: {len(table)} combinations")
+    elif name == 'year_dimension_agg':
+        print(f"Year-Dimension Type aggregation: {len(table)} combinations")
+    elif name == COUNTY_NAMES:
+        print(f"County names: {len(table)} counties by FIPS code")
+    elif name == 'state_agg':
+        print(f"State aggregation: {len(table)} states")
+        print(table[['Postal', 'avg_vaccination_rate', 'county_count', 'record_count']]
+              .sort_values('avg_vaccination_rate', ascending=False).head(10).to_string(index=False))
+    elif name in GEO_TABLES:
+        print(f"{name}: {len(table)} combinations")
+
+def save_aggregated_data(aggregations, output_dir='aggregated_data', verbose=True, report=None):
+    """Save all aggregated DataFrames to CSV files and to Parquet for downstream readers"""
     import os
     
+    if report is None:
+        report = PipelineReport('aggregate')
+    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     # Save each aggregation
-    for name, df in aggregations.items():
-        filename = f"{output_dir}/{name}.csv"
-        df.to_csv(filename, index=False)
-        print(f"Saved {filename}: {len(df)} records")
-    
-    print(f"\nAll aggregated data saved to '{output_dir}' directory")
+    with report.stage('write') as stage:
+        for name, df in aggregations.items():
+            filename = f"{output_dir}/{name}.csv"
+            df.to_csv(filename, index=False)
+            parquet_path = write_aggregate(df, name, output_dir)
+            if verbose:
+                print(f"Saved {filename} and {parquet_path}: {len(df)} records")
+        stage['rows_out'] = sum(len(df) for df in aggregations.values())
+    
+    if verbose:
+        print(f"\nAll aggregated data saved to '{output_dir}' directory")
 
 if __name__ == "__main__":
-    # Load and aggregate the data
-    aggregations = aggregate_flu_data('Flu_shot_cleaned.csv')
+    import argparse
+    import os
+    
+    parser = argparse.ArgumentParser(description='Aggregate the cleaned flu vaccination data')
+    parser.add_argument('--input', default=CLEANED_STORE,
+                        help='cleaned Parquet store, or a cleaned CSV file')
+    parser.add_argument('--engine', choices=CSV_ENGINES, default='pandas',
+                        help='CSV parser for a cleaned CSV input')
+    parser.add_argument('--seasons', type=int, nargs='+', default=None,
+                        help='merge only these season years into the partials store and publish '
+                             'every table from it instead of re-aggregating all seasons')
+    parser.add_argument('--percentiles', type=int, nargs='+', default=(),
+                        help='extra percentiles to publish next to the medians, e.g. 10 90')
+    parser.add_argument('--sketch', type=float, nargs='?', const=SKETCH_BIN_WIDTH, default=None,
+                        metavar='BIN_WIDTH',
+                        help='approximate medians and percentiles with a fixed-width histogram '
+                             f'sketch (default bin width {SKETCH_BIN_WIDTH} points); each is then '
+                             'within half a bin of the exact value')
+    parser.add_argument('--tables', nargs='+', choices=PUBLISHED_TABLES, default=None,
+                        help='publish only these tables (default: all); a full run then leaves '
+                             'the partials store, cube and tensor as they are')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='scan the season partitions of the store in this many processes')
+    parser.add_argument('--stats-store', default=STATS_STORE,
+                        help='directory of the per-season partial aggregates')
+    parser.add_argument('--quiet', action='store_true',
+                        help='skip the printed summaries and print a JSON stage report instead')
+    parser.add_argument('--report', default=None,
+                        help='write the JSON stage report (timings, rows, peak memory) to this file')
+    args = parser.parse_args()
+    if args.seasons and args.input.endswith('.csv'):
+        parser.error('--seasons reads single seasons from the partitioned store, not a CSV')
+    if args.workers and args.input.endswith('.csv'):
+        parser.error('--workers scans the season partitions of the store, not a CSV')
+    if args.seasons and not os.path.isdir(args.stats_store):
+        parser.error(f'no partials store at {args.stats_store}; run a full aggregation first')
+    built_with = store_bin_width(args.stats_store) if args.seasons else None
+    if args.seasons and args.sketch is not None and args.sketch != built_with:
+        parser.error(f'{args.stats_store} was built with '
+                     + ('exact quantiles' if built_with is None else f'sketch bin width {built_with}')
+                     + f', not {args.sketch}; rerun without --sketch or rebuild it with a full aggregation')
+    verbose = not args.quiet
+    report = PipelineReport('aggregate')
+    
+    if args.seasons:
+        # Merge the new or changed seasons and publish from the partials
+        with report.stage('partials') as stage:
+            stage['rows_out'] = update_stats_store(args.seasons, args.input, args.stats_store,
+                                                   quantile_bin_width=args.sketch)
+        with report.stage('cube') as stage:
+            stage['rows_out'] = update_cube(args.seasons, args.input)
+        with report.stage('tensor') as stage:
+            tensor = build_county_tensor(load_cube())
+            save_county_tensor(tensor, TENSOR_DIR)
+            stage['rows_out'] = tensor.shape[0]
+        names = args.tables or PUBLISHED_TABLES
+        with report.stage('merge') as stage:
+            store_names = [name for name in names if name in AGGREGATE_TABLES]
+            aggregations = aggregates_from_store(store_names, args.stats_store, args.percentiles) if store_names else {}
+            geo_names = [name for name in names if name in GEO_TABLES]
+            if geo_names:
+                # The geographic roll-ups come from the cube updated above
+                cube = load_cube()
+                aggregations.update({name: geo_table(cube, name) for name in geo_names})
+            stage['rows_out'] = sum(len(df) for df in aggregations.values())
+        if verbose:
+            print(f"Merged seasons {args.seasons} into {args.stats_store}")
+    else:
+        # Load and aggregate the data, keeping the partials store, cube and tensor in step on full runs
+        full_run = args.tables is None
+        aggregations = aggregate_flu_data(args.input, verbose=verbose, report=report, engine=args.engine,
+                                          stats_store=args.stats_store if full_run else None,
+                                          percentiles=args.percentiles, quantile_bin_width=args.sketch,
+                                          cube_dir=AGGREGATED_DIR if full_run else None,
+                                          workers=args.workers, tables=args.tables,
+                                          tensor_dir=TENSOR_DIR if full_run else None)
     
     # Save aggregated data
-    save_aggregated_data(aggregations)
-    
-    print("\n" + "="*60)
-    print("AGGREGATION COMPLETE - READY FOR VISUALIZATIONS")
-    print("="*60)
-    print("Available aggregated datasets:")
-    for name, df in aggregations.items():
-        print(f"  - {name}: {len(df)} records")
+    save_aggregated_data(aggregations, verbose=verbose, report=report)
+    
+    if args.report:
+        report.write(args.report)
+    if not verbose:
+        if not args.report:
+            print(report.to_json())
+    else:
+        print("\n" + "="*60)
+        print("AGGREGATION COMPLETE - READY FOR VISUALIZATIONS")
+        print("="*60)
+        print("Available aggregated datasets:")
+        for name, df in aggregations.items():
+            print(f"  - {name}: {len(df)} records")
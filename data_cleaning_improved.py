@@ -1,124 +1,79 @@
-import pandas as pd
-import numpy as np
-import re
+# The cleaner itself lives in cleaning_engine, shared with data_cleaning.py
+from cleaning_engine import (expand_input_paths, incremental_clean_flu_data, load_and_clean_flu_data,
+                             stream_clean_flu_data)
+from data_loading import CLEANED_STORE, CSV_ENGINES, write_cleaned_store
+from pipeline_report import PipelineReport
 
-def load_and_clean_flu_data(file_path):
-    """
-    Load and clean flu vaccination data according to specifications:
-    - Convert "Estimate (%)" to numeric
-    - Split "95% CI (%)" into ci_lower and ci_upper columns
-    - Ensure "Season/Survey Year" is integer (extract first year from ranges like "2009-10")
-    - Drop rows with missing values in key columns
-    """
-    
-    print("Loading flu vaccination data...")
-    df = pd.read_csv(file_path)
-    
-    print(f"Original data shape: {df.shape}")
-    print(f"Columns: {list(df.columns)}")
-    
-    # Convert "Estimate (%)" to numeric
-    print("\nConverting 'Estimate (%)' to numeric...")
-    df['Estimate (%)'] = pd.to_numeric(df['Estimate (%)'], errors='coerce')
-    
-    # Split "95% CI (%)" into ci_lower and ci_upper
-    print("Splitting '95% CI (%)' into ci_lower and ci_upper...")
-    
-    def parse_ci(ci_string):
-        """Parse confidence interval string like '43.9 to 47.2' or '40.2 to 75.2 ‡'"""
-        if pd.isna(ci_string):
-            return np.nan, np.nan
-        
-        ci_clean = str(ci_string).strip()
-        
-        # Handle "to" format and remove special characters like ‡
-        if ' to ' in ci_clean:
-            parts = ci_clean.split(' to ')
-            if len(parts) == 2:
-                try:
-                    lower = float(parts[0].strip())
-                    upper = float(parts[1].strip().replace('‡', '').strip())
-                    return lower, upper
-                except ValueError:
-                    return np.nan, np.nan
-        
-        return np.nan, np.nan
-    
-    # Apply the parsing function
-    ci_parsed = df['95% CI (%)'].apply(parse_ci)
-    df['ci_lower'] = [x[0] for x in ci_parsed]
-    df['ci_upper'] = [x[1] for x in ci_parsed]
-    
-    # Convert "Season/Survey Year" to integer (extract first year from ranges)
-    print("Converting 'Season/Survey Year' to integer...")
-    
-    def extract_year(year_string):
-        """Extract first year from strings like '2009-10' or '2018'"""
-        if pd.isna(year_string):
-            return np.nan
-        
-        year_str = str(year_string).strip()
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Clean the raw flu vaccination extract')
+    parser.add_argument('--input', nargs='+', default=['Flu_shot.csv'],
+                        help='raw extract(s); several files or a quoted glob are cleaned in parallel')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for multiple inputs (default: one per file, up to the core count)')
+    parser.add_argument('--engine', choices=CSV_ENGINES, default='pandas',
+                        help="CSV parser: pandas' C engine or Arrow's multithreaded reader "
+                             '(both read .gz/.zst input)')
+    parser.add_argument('--output', default=CLEANED_STORE,
+                        help='Parquet store directory, or a path ending in .csv for a CSV file')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream the input in chunks of this many rows instead of loading it whole')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only clean seasons that are new or changed since the last run, '
+                             'merging them into the existing store')
+    parser.add_argument('--quiet', action='store_true',
+                        help='skip the diagnostic summaries and print a JSON stage report instead')
+    parser.add_argument('--report', default=None,
+                        help='write the JSON stage report (timings, rows, drop reasons, peak memory) to this file')
+    args = parser.parse_args()
+    output_file = args.output
+    input_files = expand_input_paths(args.input)
+    if (args.incremental or args.chunksize) and len(input_files) > 1:
+        parser.error('--incremental and --chunksize take a single input file')
+    if args.chunksize and args.engine == 'arrow':
+        parser.error('--chunksize streams with the pandas engine only')
+    if args.incremental and (args.chunksize or output_file.endswith('.csv')):
+        parser.error('--incremental updates a Parquet store and cannot be combined '
+                     'with --chunksize or a .csv output')
+
+    verbose = not args.quiet
+    report = PipelineReport('clean')
+    cleaned_data = None
+
+    if args.incremental:
+        # Only seasons whose raw rows are not yet in the store's manifest are cleaned
+        incremental_clean_flu_data(input_files[0], output_file, engine=args.engine,
+                                   verbose=verbose, report=report)
+    elif args.chunksize:
+        # Streaming mode: memory is bounded by the chunk size, output matches the in-memory path
+        stream_clean_flu_data(input_files[0], output_file, chunksize=args.chunksize,
+                              verbose=verbose, report=report)
+    else:
+        # Load and clean the data
+        cleaned_data = load_and_clean_flu_data(input_files, workers=args.workers,
+                                               verbose=verbose, report=report, engine=args.engine)
         
-        # If it's a range like "2009-10", take the first year
-        if '-' in year_str and len(year_str) > 4:
-            try:
-                return int(year_str.split('-')[0])
-            except ValueError:
-                return np.nan
+        # Save cleaned data
+        with report.stage('write', rows_in=len(cleaned_data)) as stage:
+            if output_file.endswith('.csv'):
+                cleaned_data.to_csv(output_file, index=False)
+            else:
+                write_cleaned_store(cleaned_data, output_file)
+            stage['rows_out'] = len(cleaned_data)
+    
+    if args.report:
+        report.write(args.report)
+    if not verbose:
+        if not args.report:
+            print(report.to_json())
+    else:
+        print(f"\nCleaned data saved to: {output_file}")
         
-        # If it's already a single year
-        try:
-            return int(year_str)
-        except ValueError:
-            return np.nan
-    
-    df['Season/Survey Year'] = df['Season/Survey Year'].apply(extract_year)
-    
-    # Identify key columns for missing value check
-    key_columns = ['Estimate (%)', 'ci_lower', 'ci_upper', 'Season/Survey Year']
-    
-    # Check for missing values before dropping
-    print(f"\nMissing values in key columns before cleaning:")
-    for col in key_columns:
-        missing_count = df[col].isna().sum()
-        print(f"  {col}: {missing_count} missing values")
-    
-    # Drop rows with missing values in key columns
-    print("\nDropping rows with missing values in key columns...")
-    initial_rows = len(df)
-    df_clean = df.dropna(subset=key_columns)
-    final_rows = len(df_clean)
-    dropped_rows = initial_rows - final_rows
-    
-    print(f"Dropped {dropped_rows} rows ({dropped_rows/initial_rows*100:.1f}% of data)")
-    print(f"Final data shape: {df_clean.shape}")
-    
-    # Display summary statistics
-    print("\nSummary statistics for cleaned data:")
-    print(df_clean[['Estimate (%)', 'ci_lower', 'ci_upper', 'Season/Survey Year']].describe())
-    
-    # Check data types
-    print("\nData types after cleaning:")
-    print(df_clean.dtypes)
-    
-    # Show sample of cleaned data
-    print("\nSample of cleaned data:")
-    print(df_clean[['Geography', 'Season/Survey Year', 'Estimate (%)', 'ci_lower', 'ci_upper']].head(10))
-    
-    return df_clean
-
-if __name__ == "__main__":
-    # Load and clean the data
-    cleaned_data = load_and_clean_flu_data('Flu_shot.csv')
-    
-    # Save cleaned data
-    output_file = 'Flu_shot_cleaned.csv'
-    cleaned_data.to_csv(output_file, index=False)
-    print(f"\nCleaned data saved to: {output_file}")
-    
-    # Additional analysis
-    print(f"\nData summary:")
-    print(f"Total records: {len(cleaned_data)}")
-    print(f"Unique counties: {cleaned_data['Geography'].nunique()}")
-    print(f"Year range: {cleaned_data['Season/Survey Year'].min()} - {cleaned_data['Season/Survey Year'].max()}")
-    print(f"Average vaccination rate: {cleaned_data['Estimate (%)'].mean():.1f}%")
+        if cleaned_data is not None:
+            # Additional analysis
+            print(f"\nData summary:")
+            print(f"Total records: {len(cleaned_data)}")
+            print(f"Unique counties: {cleaned_data['Geography'].nunique()}")
+            print(f"Year range: {cleaned_data['Season/Survey Year'].min()} - {cleaned_data['Season/Survey Year'].max()}")
+            print(f"Average vaccination rate: {cleaned_data['Estimate (%)'].mean():.1f}%")
@@ -0,0 +1,331 @@
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CLEANED_FILE = 'Flu_shot_cleaned.csv'
+# Canonical cleaned dataset: Parquet files partitioned by season year
+CLEANED_STORE = 'Flu_shot_cleaned'
+AGGREGATED_DIR = 'aggregated_data'
+
+YEAR_COLUMN = 'Season/Survey Year'
+# Hive partition key; 'Season/Survey Year' cannot be used as a directory name
+PARTITION_COLUMN = 'season_year'
+# Small row groups let FIPS min/max statistics skip data for state filters
+# (CDC extracts are ordered by geography within a season)
+ROW_GROUP_ROWS = 16_384
+
+# CSV parsers: pandas' single-threaded C engine, or Arrow's multithreaded reader
+CSV_ENGINES = ('pandas', 'arrow')
+# The strings pandas reads as missing, so both engines agree on what is NA
+CSV_NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+                   '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+                   'n/a', 'nan', 'null']
+
+# County dimension table: the name of each county FIPS code. County aggregates are
+# keyed by FIPS, since names repeat across states ('Washington', 'Jefferson')
+COUNTY_NAMES = 'county_names'
+
+# Aggregate tables that carry a year column are stored partitioned like the cleaned data
+PARTITIONED_AGGREGATES = {'county_year_agg', 'year_dimension_agg'}
+
+# Compact dtypes for Flu_shot_cleaned.csv. Low-cardinality text becomes categorical,
+# FIPS and years become fixed-width ints and rates/intervals float32. FIPS and
+# season_end_year use nullable ints so files with gaps (or older files) still load.
+CLEANED_SCHEMA = {
+    'Vaccine': 'category',
+    'Geography Type': 'category',
+    'Geography': 'category',
+    'FIPS': 'Int32',
+    'Season/Survey Year': 'int16',
+    'season_end_year': 'Int16',
+    'Dimension Type': 'category',
+    'Dimension': 'category',
+    'Estimate (%)': 'float32',
+    'ci_lower': 'float32',
+    'ci_upper': 'float32',
+    'Sample Size': 'float32',
+}
+
+# The store keeps full float64 precision for measures so aggregation stays exact;
+# readers narrow them with CLEANED_SCHEMA
+STORE_SCHEMA = {
+    col: ('float64' if dtype == 'float32' else dtype) for col, dtype in CLEANED_SCHEMA.items()
+}
+
+# Column sets used by the county-level readers
+COUNTY_YEAR_COLUMNS = ['Geography', 'FIPS', 'Season/Survey Year', 'Estimate (%)',
+                       'ci_lower', 'ci_upper', 'Sample Size']
+
+
+def read_csv_arrow(path, delimiter=',', columns=None, as_text=False, arrow_backed=False):
+    """
+    Read a CSV file with Arrow's multithreaded parser.
+
+    Compressed files (.gz, .zst, .bz2) are decompressed as a stream while parsing.
+    `columns` limits the read to those columns; as_text=True keeps every column
+    as a string, like pandas' dtype=str. With arrow_backed=True the frame keeps
+    Arrow memory (pd.ArrowDtype columns) instead of converting to NumPy, so it
+    can be handed back to pyarrow compute kernels without a copy.
+    """
+    convert_options = pcsv.ConvertOptions(
+        null_values=CSV_NULL_VALUES, strings_can_be_null=True, include_columns=columns
+    )
+    if as_text:
+        header = pcsv.open_csv(path, parse_options=pcsv.ParseOptions(delimiter=delimiter)).schema.names
+        convert_options.column_types = {name: pa.string() for name in header}
+    table = pcsv.read_csv(
+        path,
+        read_options=pcsv.ReadOptions(use_threads=True),
+        parse_options=pcsv.ParseOptions(delimiter=delimiter),
+        convert_options=convert_options,
+    )
+    if arrow_backed:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas()
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int16())]), flavor='hive')
+
+
+def _filter_expression(years=None, states=None):
+    """Build a pyarrow filter on the partition key (years) and FIPS ranges (states)"""
+    expr = None
+    if years is not None:
+        expr = ds.field(PARTITION_COLUMN).isin([int(y) for y in years])
+    if states is not None:
+        fips = ds.field('FIPS')
+        state_expr = None
+        for state in states:
+            low = int(state) * 1000
+            in_state = (fips >= low) & (fips < low + 1000)
+            state_expr = in_state if state_expr is None else (state_expr | in_state)
+        expr = state_expr if expr is None else (expr & state_expr)
+    return expr
+
+
+def _filter_frame(df, years=None, states=None):
+    """Apply the same year/state predicates to an in-memory frame (CSV fallback)"""
+    if years is not None:
+        df = df[df[YEAR_COLUMN].isin([int(y) for y in years])]
+    if states is not None:
+        state_codes = pd.to_numeric(df['FIPS'], errors='coerce') // 1000
+        df = df[state_codes.isin([int(s) for s in states])]
+    return df
+
+
+def _with_filter_columns(columns, years=None, states=None):
+    """Extend a projection with the columns the year/state predicates need"""
+    if columns is None:
+        return None
+    needed = list(columns)
+    if years is not None and YEAR_COLUMN not in needed:
+        needed.append(YEAR_COLUMN)
+    if states is not None and 'FIPS' not in needed:
+        needed.append('FIPS')
+    return needed
+
+
+def _read_dataset(path, columns=None, years=None, states=None):
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning())
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+    table = dataset.to_table(columns=columns, filter=_filter_expression(years, states))
+    df = table.to_pandas()
+    # Dictionaries from different files are unified in arrival order; sort them so
+    # categorical groupbys and sorts order keys the same way as plain strings
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def write_partitioned(df, path, replace=True, part=None):
+    """
+    Write a frame with a 'Season/Survey Year' column as a Parquet dataset partitioned by year.
+
+    With replace=True the whole dataset is rewritten; otherwise only the year
+    partitions present in df are replaced and the rest are kept. Passing `part`
+    (e.g. a chunk number) instead adds files named after it next to the existing
+    ones, so successive chunks of the same year accumulate.
+    """
+    if replace and os.path.isdir(path):
+        shutil.rmtree(path)
+    frame = df.assign(**{PARTITION_COLUMN: df[YEAR_COLUMN].astype('int16')})
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    options = {'existing_data_behavior': 'delete_matching'}
+    if part is not None:
+        options = {'existing_data_behavior': 'overwrite_or_ignore',
+                   'basename_template': f'part-{part:05d}-{{i}}.parquet'}
+    ds.write_dataset(
+        table, path, format='parquet', partitioning=_partitioning(),
+        max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=0, **options
+    )
+
+
+def replace_partitions(df, path, years):
+    """
+    Replace the year partitions `years` of a partitioned dataset with the rows of df.
+
+    Partitions of other years are kept, and a listed year with no rows in df
+    loses its partition.
+    """
+    for year in set(int(y) for y in years) - set(df[YEAR_COLUMN].astype(int)):
+        shutil.rmtree(os.path.join(path, f'{PARTITION_COLUMN}={year}'), ignore_errors=True)
+    if len(df):
+        write_partitioned(df, path, replace=False)
+
+
+def write_cleaned_store(df, store_path=CLEANED_STORE, replace=True, part=None, years=None):
+    """
+    Write cleaned data to the partitioned Parquet store.
+
+    Rows keep their input order within each year so that downstream groupbys sum
+    values in the same order as a CSV read and produce identical rounded results.
+    Passing `years` replaces exactly those season partitions (see replace_partitions),
+    removing the ones df has no rows for.
+    """
+    # Remaining text columns are pinned to string so an all-missing chunk is not typed as null
+    schema = {col: STORE_SCHEMA.get(col, 'string') for col in df.columns
+              if col in STORE_SCHEMA or pd.api.types.is_string_dtype(df[col])}
+    frame = df.astype(schema)
+    if years is not None:
+        replace_partitions(frame, store_path, years)
+    else:
+        write_partitioned(frame, store_path, replace=replace, part=part)
+    return len(frame)
+
+
+def read_cleaned_store(columns=None, years=None, states=None, store_path=CLEANED_STORE):
+    """
+    Read the cleaned store at full stored precision.
+
+    `columns` projects the read to the listed columns, `years` prunes whole season
+    partitions and `states` (FIPS state codes such as '06' or 6) is pushed down to
+    Parquet row-group statistics on FIPS.
+    """
+    return _read_dataset(store_path, columns, years, states)
+
+
+def cleaned_source(path=CLEANED_STORE):
+    """
+    The file or store directory load_cleaned_data reads for `path`: the path
+    itself, or the cleaned CSV when the store is missing and the CSV exists
+    """
+    if not path.endswith('.csv') and not os.path.isdir(path) and os.path.exists(CLEANED_FILE):
+        return CLEANED_FILE
+    return path
+
+
+def load_cleaned_data(columns=None, years=None, states=None, path=CLEANED_STORE):
+    """
+    Load the cleaned dataset with the shared compact schema.
+
+    Reads the Parquet store with column projection and year/state predicate
+    pushdown. A path ending in '.csv' (or a missing store with the CSV next to it)
+    is parsed as CSV instead, with only the requested columns. Categorical columns
+    must be grouped with observed=True to avoid materializing every category
+    combination.
+    """
+    source = cleaned_source(path)
+    if source.endswith('.csv'):
+        usecols = _with_filter_columns(columns, years, states)
+        dtype = CLEANED_SCHEMA if usecols is None else {
+            col: CLEANED_SCHEMA[col] for col in usecols if col in CLEANED_SCHEMA
+        }
+        df = _filter_frame(pd.read_csv(source, usecols=usecols, dtype=dtype), years, states)
+        return df if columns is None else df[list(columns)]
+
+    df = read_cleaned_store(columns, years, states, path)
+    schema = {col: dtype for col, dtype in CLEANED_SCHEMA.items() if col in df.columns}
+    return df.astype(schema)
+
+
+def county_name_table(df):
+    """County dimension table (FIPS, Geography) of cleaned rows: the first name of each FIPS code"""
+    names = df.loc[df['FIPS'].notna() & df['Geography'].notna(), ['FIPS', 'Geography']]
+    return names.drop_duplicates('FIPS').sort_values('FIPS').reset_index(drop=True)
+
+
+def attach_county_names(table, names):
+    """Add the Geography column of a county dimension table to a FIPS-keyed table, after FIPS"""
+    table = table.drop(columns='Geography', errors='ignore')
+    geography = table['FIPS'].map(names.set_index('FIPS')['Geography'])
+    table.insert(table.columns.get_loc('FIPS') + 1, 'Geography', geography)
+    return table
+
+
+def load_county_names(data_dir=AGGREGATED_DIR):
+    """Load the published county dimension table"""
+    return load_aggregate(COUNTY_NAMES, data_dir=data_dir)
+
+
+def list_years(path=CLEANED_STORE):
+    """Return the season years in a partitioned dataset from its directory names, without reading rows"""
+    if not os.path.isdir(path):
+        return sorted(load_cleaned_data([YEAR_COLUMN], path=path)[YEAR_COLUMN].unique().tolist())
+    prefix = f'{PARTITION_COLUMN}='
+    return sorted(int(name[len(prefix):]) for name in os.listdir(path) if name.startswith(prefix))
+
+
+def write_aggregate(df, name, output_dir=AGGREGATED_DIR):
+    """Write one aggregate table to Parquet (partitioned by year where it has one)"""
+    path = os.path.join(output_dir, f'{name}.parquet')
+    if name in PARTITIONED_AGGREGATES:
+        write_partitioned(df, path)
+    else:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    return path
+
+
+def load_aggregate(name, columns=None, years=None, states=None, data_dir=AGGREGATED_DIR):
+    """
+    Load an aggregate table by name (e.g. 'county_year_agg').
+
+    Reads aggregated_data/<name>.parquet with column projection and year/state
+    pushdown, falling back to aggregated_data/<name>.csv when no Parquet copy exists.
+    """
+    path = os.path.join(data_dir, f'{name}.parquet')
+    if os.path.isdir(path):
+        return _read_dataset(path, columns, years, states)
+    needed = _with_filter_columns(columns, years, states)
+    if os.path.exists(path):
+        df = pd.read_parquet(path, columns=needed)
+    else:
+        df = pd.read_csv(os.path.join(data_dir, f'{name}.csv'), usecols=needed)
+    df = _filter_frame(df, years, states)
+    return df if columns is None else df[list(columns)]
+
+
+def aggregate_version(names, data_dir=AGGREGATED_DIR):
+    """
+    Short fingerprint of the files of aggregate tables (paths, sizes and
+    modification times, not contents), which changes whenever the aggregation
+    rewrites one of them; cheap enough to check on every request
+    """
+    digest = hashlib.sha1()
+    for name in names:
+        for ext in ('parquet', 'csv'):
+            path = os.path.join(data_dir, f'{name}.{ext}')
+            files = [path] if os.path.isfile(path) else sorted(
+                os.path.join(root, f) for root, _, fs in os.walk(path) for f in fs)
+            if files:
+                break
+        for path in files:
+            stat = os.stat(path)
+            digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:12]
+
+
+def list_aggregate_years(name, data_dir=AGGREGATED_DIR):
+    """Return the years available in an aggregate table without reading its rows"""
+    path = os.path.join(data_dir, f'{name}.parquet')
+    if os.path.isdir(path):
+        return list_years(path)
+    return sorted(load_aggregate(name, columns=[YEAR_COLUMN], data_dir=data_dir)[YEAR_COLUMN].unique().tolist())
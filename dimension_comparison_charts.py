@@ -4,6 +4,8 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 
+from data_loading import load_aggregate
+
 def create_dimension_comparison_charts():
     """
     Create bar charts comparing vaccination rates by Dimension (Age group, Setting)
@@ -11,7 +13,7 @@ def create_dimension_comparison_charts():
     """
     
     print("Loading dimension aggregated data...")
-    df = pd.read_csv('aggregated_data/dimension_agg.csv')
+    df = load_aggregate('dimension_agg')
     
     print(f"Data shape: {df.shape}")
     print(f"Dimension types: {df['Dimension Type'].unique()}")
@@ -195,7 +197,7 @@ def create_yearly_comparison_chart():
     print("\nCreating yearly comparison chart...")
     
     # Load the year-dimension aggregated data
-    df_year = pd.read_csv('aggregated_data/year_dimension_agg.csv')
+    df_year = load_aggregate('year_dimension_agg')
     
     # Get unique years
     years = sorted(df_year['Season/Survey Year'].unique())
@@ -268,7 +270,7 @@ def create_detailed_dimension_analysis():
     
     print("\nCreating detailed dimension analysis...")
     
-    df = pd.read_csv('aggregated_data/dimension_agg.csv')
+    df = load_aggregate('dimension_agg')
     
     # Focus on Age and Setting dimensions
     age_setting_data = df[df['Dimension Type'].isin(['Age', '>=18 Years', '6 Months - 17 Years', 
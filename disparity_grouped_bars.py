@@ -3,7 +3,15 @@ import numpy as np
 import plotly.graph_objects as go
 from typing import List, Dict
 
-INPUT_FILE = 'Flu_shot_cleaned.csv'
+from olap_cube import FluCube, load_cube
+
+# Published names of the cube's roll-up measures
+CUBE_MEASURES = {
+	'avg_vaccination_rate': 'avg_rate',
+	'avg_ci_lower': 'avg_lower',
+	'avg_ci_upper': 'avg_upper',
+	'record_count': 'records'
+}
 
 OUTPUTS = {
 	'Age': 'disparities_age_grouped.html',
@@ -14,21 +22,15 @@ OUTPUTS = {
 SETTING_NAMES = ['Medical Setting', 'Non-Medical Setting', 'Pharmacy/Store', 'Workplace', 'School']
 
 
-def aggregate_by_year_and_dimension(df: pd.DataFrame, dim_type: str) -> pd.DataFrame:
+def aggregate_by_year_and_dimension(cube: FluCube, dim_type: str) -> pd.DataFrame:
+	# Settings are matched by name across all dimension types
 	if dim_type == 'Setting':
-		mask = df['Dimension'].isin(SETTING_NAMES)
-		df_sub = df.loc[mask].copy()
-		group_cols = ['Season/Survey Year', 'Dimension']
+		cube_sub = cube.slice(dimension=SETTING_NAMES)
 	else:
-		df_sub = df[df['Dimension Type'] == dim_type].copy()
-		group_cols = ['Season/Survey Year', 'Dimension']
-
-	agg = df_sub.groupby(group_cols).agg(
-		avg_rate=('Estimate (%)','mean'),
-		avg_lower=('ci_lower','mean'),
-		avg_upper=('ci_upper','mean'),
-		records=('Estimate (%)','count')
-	).reset_index()
+		cube_sub = cube.slice(dimension_type=dim_type)
+
+	agg = cube_sub.rollup(['year', 'dimension'])
+	agg = agg[['Season/Survey Year', 'Dimension'] + list(CUBE_MEASURES)].rename(columns=CUBE_MEASURES)
 	return agg.sort_values(['Season/Survey Year','Dimension'])
 
 
@@ -116,16 +118,16 @@ def build_grouped_bar(agg: pd.DataFrame, gaps: pd.DataFrame, dim_type: str, outp
 
 
 def main():
-	print('Loading cleaned dataset...')
-	df = pd.read_csv(INPUT_FILE)
+	print('Loading vaccination cube...')
+	cube = load_cube()
 
 	# Compute national average by year
-	national_yearly = df.groupby('Season/Survey Year', as_index=False)['Estimate (%)'].mean()
-	national_yearly.rename(columns={'Estimate (%)': 'national_avg'}, inplace=True)
+	national_yearly = cube.rollup(['year'])[['Season/Survey Year', 'avg_vaccination_rate']]
+	national_yearly = national_yearly.rename(columns={'avg_vaccination_rate': 'national_avg'})
 
 	for dim_type, out in OUTPUTS.items():
 		print(f"\nProcessing: {dim_type}")
-		agg = aggregate_by_year_and_dimension(df, dim_type)
+		agg = aggregate_by_year_and_dimension(cube, dim_type)
 		gaps = compute_yearly_gaps(agg)
 		build_grouped_bar(agg, gaps, dim_type, out, national_yearly)
 
@@ -0,0 +1,83 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """
+    Bounded LRU cache of serialized Plotly figures for Dash callbacks.
+
+    Figures are kept as their JSON text, so the cache's size is the length of
+    what it holds and a hit costs a json.loads instead of building and
+    serializing a go.Figure. Once the cached text exceeds max_bytes the least
+    recently used figures are evicted; a figure larger than the whole cap is
+    served but not kept. A lock guards the entries and counters, as Dash may
+    run callbacks in several threads; figures are built outside it.
+
+        cache = FigureCache(64 * 2**20)
+        figure = cache.get_or_build(('06', 2023, version), lambda: make_map(...))
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """The cached figure JSON of `key` (marked most recently used), or None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        """Cache one figure's JSON text, evicting least recently used figures over the cap"""
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= len(self._entries.pop(key))
+            if len(text) > self.max_bytes:
+                return
+            self._entries[key] = text
+            self.bytes += len(text)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        """
+        The figure of `key` as a dict Dash can return: parsed from the cache, or
+        built with build() (a go.Figure) and cached. Threads missing the same key
+        at once may each build it; the last one's figure is kept.
+        """
+        text = self.get(key)
+        if text is None:
+            text = build().to_json()
+            self.put(key, text)
+        return json.loads(text)
+
+    def stats(self):
+        """Hit/miss/eviction counters and the current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,87 @@
+# Geographic hierarchy of the county FIPS codes: county -> state -> census region /
+# HHS region -> national. Every level follows from the state code (FIPS // 1000),
+# so it is derived with array lookups instead of matching county names.
+import numpy as np
+import pandas as pd
+
+# Hierarchy columns, as added to county-keyed frames by add_geo_columns
+STATE_FIPS = 'State_FIPS'
+GEO_COLUMNS = [STATE_FIPS, 'State', 'Postal', 'Census Region', 'HHS Region']
+
+# state FIPS: (name, USPS code, census region, HHS region); territories have no census region
+_STATES = {
+    1: ('Alabama', 'AL', 'South', 4), 2: ('Alaska', 'AK', 'West', 10),
+    4: ('Arizona', 'AZ', 'West', 9), 5: ('Arkansas', 'AR', 'South', 6),
+    6: ('California', 'CA', 'West', 9), 8: ('Colorado', 'CO', 'West', 8),
+    9: ('Connecticut', 'CT', 'Northeast', 1), 10: ('Delaware', 'DE', 'South', 3),
+    11: ('District of Columbia', 'DC', 'South', 3), 12: ('Florida', 'FL', 'South', 4),
+    13: ('Georgia', 'GA', 'South', 4), 15: ('Hawaii', 'HI', 'West', 9),
+    16: ('Idaho', 'ID', 'West', 10), 17: ('Illinois', 'IL', 'Midwest', 5),
+    18: ('Indiana', 'IN', 'Midwest', 5), 19: ('Iowa', 'IA', 'Midwest', 7),
+    20: ('Kansas', 'KS', 'Midwest', 7), 21: ('Kentucky', 'KY', 'South', 4),
+    22: ('Louisiana', 'LA', 'South', 6), 23: ('Maine', 'ME', 'Northeast', 1),
+    24: ('Maryland', 'MD', 'South', 3), 25: ('Massachusetts', 'MA', 'Northeast', 1),
+    26: ('Michigan', 'MI', 'Midwest', 5), 27: ('Minnesota', 'MN', 'Midwest', 5),
+    28: ('Mississippi', 'MS', 'South', 4), 29: ('Missouri', 'MO', 'Midwest', 7),
+    30: ('Montana', 'MT', 'West', 8), 31: ('Nebraska', 'NE', 'Midwest', 7),
+    32: ('Nevada', 'NV', 'West', 9), 33: ('New Hampshire', 'NH', 'Northeast', 1),
+    34: ('New Jersey', 'NJ', 'Northeast', 2), 35: ('New Mexico', 'NM', 'West', 6),
+    36: ('New York', 'NY', 'Northeast', 2), 37: ('North Carolina', 'NC', 'South', 4),
+    38: ('North Dakota', 'ND', 'Midwest', 8), 39: ('Ohio', 'OH', 'Midwest', 5),
+    40: ('Oklahoma', 'OK', 'South', 6), 41: ('Oregon', 'OR', 'West', 10),
+    42: ('Pennsylvania', 'PA', 'Northeast', 3), 44: ('Rhode Island', 'RI', 'Northeast', 1),
+    45: ('South Carolina', 'SC', 'South', 4), 46: ('South Dakota', 'SD', 'Midwest', 8),
+    47: ('Tennessee', 'TN', 'South', 4), 48: ('Texas', 'TX', 'South', 6),
+    49: ('Utah', 'UT', 'West', 8), 50: ('Vermont', 'VT', 'Northeast', 1),
+    51: ('Virginia', 'VA', 'South', 3), 53: ('Washington', 'WA', 'West', 10),
+    54: ('West Virginia', 'WV', 'South', 3), 55: ('Wisconsin', 'WI', 'Midwest', 5),
+    56: ('Wyoming', 'WY', 'West', 8),
+    60: ('American Samoa', 'AS', None, 9), 66: ('Guam', 'GU', None, 9),
+    69: ('Northern Mariana Islands', 'MP', None, 9), 72: ('Puerto Rico', 'PR', None, 2),
+    78: ('U.S. Virgin Islands', 'VI', None, 2),
+}
+
+# One row per state FIPS code, sorted by code
+STATES = pd.DataFrame(
+    [(fips,) + attrs for fips, attrs in sorted(_STATES.items())], columns=GEO_COLUMNS
+).astype({STATE_FIPS: 'Int16', 'State': 'category', 'Postal': 'category',
+          'Census Region': 'category', 'HHS Region': 'Int8'})
+
+
+def state_of(fips):
+    """State FIPS code (Int16, missing where the county FIPS is) of county FIPS codes"""
+    fips = pd.array(fips, dtype='Int32')
+    return pd.array(fips // 1000, dtype='Int16')
+
+
+def _state_rows(states):
+    """Rows of STATES for state codes, with missing names where a code is unknown or missing"""
+    lookup = np.full(100, -1)
+    lookup[STATES[STATE_FIPS].to_numpy(dtype='int64')] = np.arange(len(STATES))
+    codes = np.asarray(pd.array(states, dtype='Int16').fillna(-1), dtype='int64')
+    position = np.where((codes >= 0) & (codes < 100), lookup[np.clip(codes, 0, 99)], -1)
+    found = position >= 0
+    rows = STATES.iloc[np.where(found, position, 0)].reset_index(drop=True)
+    rows.loc[~found, GEO_COLUMNS[1:]] = pd.NA
+    return rows
+
+
+def add_state_columns(table):
+    """Insert the names and regions of a State_FIPS-keyed table's states after State_FIPS (missing ones only)"""
+    missing = [col for col in GEO_COLUMNS[1:] if col not in table.columns]
+    if not missing:
+        return table
+    rows = _state_rows(table[STATE_FIPS])
+    table = table.copy()
+    at = table.columns.get_loc(STATE_FIPS) + 1
+    for i, col in enumerate(missing):
+        table.insert(at + i, col, rows[col].array)
+    return table
+
+
+def add_geo_columns(table, after='FIPS'):
+    """Insert the hierarchy columns of a FIPS-keyed table's counties after `after` (missing ones only)"""
+    if STATE_FIPS not in table.columns:
+        table = table.copy()
+        table.insert(table.columns.get_loc(after) + 1, STATE_FIPS, state_of(table['FIPS']))
+    return add_state_columns(table)
@@ -1,18 +1,91 @@
-import pandas as pd
+import os
+import threading
+
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-from dash import Dash, html, dcc, Input, Output, dash_table
+import pyarrow as pa
+import pyarrow.feather as feather
+from dash import Dash, html, dcc, Input, Output
 import dash_bootstrap_components as dbc
 
-# Load data once at startup
-print("Loading data...")
-df_original = pd.read_csv('Flu_shot_cleaned.csv')
-df_county_year = pd.read_csv('aggregated_data/county_year_agg.csv')
-df_county_agg = pd.read_csv('aggregated_data/county_agg.csv')
-df_year_agg = pd.read_csv('aggregated_data/year_agg.csv')
-df_dimension_agg = pd.read_csv('aggregated_data/dimension_agg.csv')
+from data_loading import AGGREGATED_DIR, aggregate_version, list_aggregate_years, load_aggregate
+
+# Aggregate tables the tabs are drawn from; their file fingerprint is the dataset version
+DASHBOARD_TABLES = ['county_year_agg', 'county_agg', 'year_agg', 'dimension_agg']
+DEFAULT_TAB = 'national'
+# Feather snapshot of the loaded tables (one file per table), used instead of the
+# aggregate files while its version matches theirs
+DASHBOARD_SNAPSHOT = os.path.join(AGGREGATED_DIR, 'dashboard_snapshot')
+# Schema metadata key holding the dataset version a snapshot file was taken of
+SNAPSHOT_VERSION_KEY = b'dashboard_version'
+
+# (dataset version, tables by name) of the last load, replaced in one assignment so
+# every render reads one consistent set. Nothing is loaded at startup; the first
+# tab request loads the tables
+_data = (None, None)
+# Rendered tab contents by (dataset version, tab id)
+_tab_cache = {}
+# Dash serves callbacks on threads: guards reloading the tables and filling _tab_cache
+_data_lock = threading.Lock()
+
+def load_dashboard_tables():
+    """The tables the tabs are drawn from, read from the aggregate files"""
+    return {
+        # Only the most recent year of county-year data is used (outlier tab)
+        'county_year_agg': load_aggregate('county_year_agg', years=list_aggregate_years('county_year_agg')[-1:]),
+        'county_agg': load_aggregate('county_agg'),
+        'year_agg': load_aggregate('year_agg'),
+        'dimension_agg': load_aggregate('dimension_agg'),
+    }
+
+def read_snapshot(version, path=DASHBOARD_SNAPSHOT):
+    """
+    The snapshot's tables if every file of it was taken of this dataset version,
+    else None. Feather holds only data, so reading a snapshot never runs code
+    from the data directory.
+    """
+    tables = {}
+    for name in DASHBOARD_TABLES:
+        file_path = os.path.join(path, f'{name}.feather')
+        if not os.path.exists(file_path):
+            return None
+        table = feather.read_table(file_path)
+        if (table.schema.metadata or {}).get(SNAPSHOT_VERSION_KEY) != version.encode():
+            return None
+        tables[name] = table.to_pandas()
+    return tables
+
+def write_snapshot(tables, version, path=DASHBOARD_SNAPSHOT):
+    os.makedirs(path, exist_ok=True)
+    for name in DASHBOARD_TABLES:
+        table = pa.Table.from_pandas(tables[name], preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), SNAPSHOT_VERSION_KEY: version.encode()})
+        file_path = os.path.join(path, f'{name}.feather')
+        # Per-process temporary name, so workers starting together do not collide
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        feather.write_feather(table, tmp_path)
+        os.replace(tmp_path, file_path)
+
+def refresh_data():
+    """
+    (Re)load the tables when they changed on disk since the last load, dropping
+    the tabs rendered from the old ones; returns (dataset version, tables). Tables
+    come from the snapshot when it is current, otherwise from the aggregate files,
+    which then replace the snapshot. Callbacks arriving during a reload wait for
+    it instead of loading the tables again.
+    """
+    global _data
+    version = aggregate_version(DASHBOARD_TABLES)
+    with _data_lock:
+        if version != _data[0]:
+            tables = read_snapshot(version)
+            if tables is None:
+                tables = load_dashboard_tables()
+                write_snapshot(tables, version)
+            _data = (version, tables)
+            _tab_cache.clear()
+        return _data
 
 # Initialize Dash app with Bootstrap theme
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -30,8 +103,9 @@ COLORS = {
     'dark': '#343a40'
 }
 
-def create_national_trends_tab():
+def create_national_trends_tab(tables):
     """Create National Trends tab content"""
+    df_year_agg = tables['year_agg']
     # National average line with CI
     fig = go.Figure()
     
@@ -87,8 +161,9 @@ def create_national_trends_tab():
         ])
     ])
 
-def create_county_comparisons_tab():
+def create_county_comparisons_tab(tables):
     """Create County Comparisons tab content"""
+    df_county_agg = tables['county_agg']
     # Top 10 vs Bottom 10 counties
     county_avg = df_county_agg.sort_values('avg_vaccination_rate', ascending=False)
     top_10 = county_avg.head(10)
@@ -134,8 +209,9 @@ def create_county_comparisons_tab():
         ])
     ])
 
-def create_demographic_disparities_tab():
+def create_demographic_disparities_tab(tables):
     """Create Demographic Disparities tab content"""
+    df_dimension_agg = tables['dimension_agg']
     # Age group analysis
     age_data = df_dimension_agg[df_dimension_agg['Dimension Type'] == 'Age'].sort_values('avg_vaccination_rate', ascending=True)
     
@@ -174,8 +250,9 @@ def create_demographic_disparities_tab():
         ])
     ])
 
-def create_settings_tab():
+def create_settings_tab(tables):
     """Create Settings of Vaccination tab content"""
+    df_dimension_agg = tables['dimension_agg']
     # Setting analysis
     setting_data = df_dimension_agg[df_dimension_agg['Dimension Type'].isin(['>=18 Years', '18-49 Years', '50-64 Years', '>=65 Years'])]
     setting_data = setting_data[setting_data['Dimension'].isin(['Medical Setting', 'Non-Medical Setting', 'Pharmacy/Store', 'Workplace'])]
@@ -219,8 +296,9 @@ def create_settings_tab():
         ])
     ])
 
-def create_outlier_analysis_tab():
+def create_outlier_analysis_tab(tables):
     """Create Outlier Analysis tab content"""
+    df_county_year = tables['county_year_agg']
     # Sample size vs rate scatter plot
     recent_data = df_county_year[df_county_year['Season/Survey Year'] == df_county_year['Season/Survey Year'].max()]
     
@@ -287,7 +365,33 @@ def create_outlier_analysis_tab():
         ])
     ])
 
-# App layout
+# Tab id: (label, content builder), in display order
+TABS = {
+    'national': ("National Trends", create_national_trends_tab),
+    'counties': ("County Comparisons", create_county_comparisons_tab),
+    'demographics': ("Demographic Disparities", create_demographic_disparities_tab),
+    'settings': ("Vaccination Settings", create_settings_tab),
+    'outliers': ("Outlier Analysis", create_outlier_analysis_tab),
+}
+
+def render_tab(tab_id):
+    """
+    Content of one tab, built on first use and memoized per dataset version. It is
+    built from the one set of tables refresh_data returned, outside the lock, and
+    not memoized if the tables were reloaded meanwhile.
+    """
+    version, tables = refresh_data()
+    key = (version, tab_id)
+    with _data_lock:
+        content = _tab_cache.get(key)
+    if content is None:
+        content = TABS[tab_id][1](tables)
+        with _data_lock:
+            if _data[0] == version:
+                content = _tab_cache.setdefault(key, content)
+    return content
+
+# App layout: only the tab headers; the active tab's content is rendered on demand
 app.layout = dbc.Container([
     dbc.Row([
         dbc.Col([
@@ -300,17 +404,30 @@ app.layout = dbc.Container([
     dbc.Row([
         dbc.Col([
             dbc.Tabs([
-                dbc.Tab(create_national_trends_tab(), label="National Trends", tab_id="national"),
-                dbc.Tab(create_county_comparisons_tab(), label="County Comparisons", tab_id="counties"),
-                dbc.Tab(create_demographic_disparities_tab(), label="Demographic Disparities", tab_id="demographics"),
-                dbc.Tab(create_settings_tab(), label="Vaccination Settings", tab_id="settings"),
-                dbc.Tab(create_outlier_analysis_tab(), label="Outlier Analysis", tab_id="outliers")
-            ])
+                dbc.Tab(label=label, tab_id=tab_id) for tab_id, (label, _) in TABS.items()
+            ], id='tabs', active_tab=DEFAULT_TAB),
+            html.Div(id='tab-content', className="mt-3")
         ])
     ])
 ], fluid=True)
 
+@app.callback(Output('tab-content', 'children'), Input('tabs', 'active_tab'))
+def update_tab(active_tab):
+    return render_tab(active_tab or DEFAULT_TAB)
+
 if __name__ == '__main__':
-    print("Starting dashboard server...")
-    print("Open your browser to: http://localhost:8050")
-    app.run(host='0.0.0.0', port=8050, debug=False)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Serve the flu vaccination dashboard')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--build-snapshot', action='store_true',
+                        help=f'write {DASHBOARD_SNAPSHOT} from the aggregate tables and exit, '
+                             'so new workers start from it')
+    args = parser.parse_args()
+    if args.build_snapshot:
+        write_snapshot(load_dashboard_tables(), aggregate_version(DASHBOARD_TABLES))
+        print(f"Saved: {DASHBOARD_SNAPSHOT}")
+    else:
+        print("Starting dashboard server...")
+        print(f"Open your browser to: http://localhost:{args.port}")
+        app.run(host='0.0.0.0', port=args.port, debug=False)
@@ -1,18 +1,19 @@
-import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 
-INPUT_FILE = 'aggregated_data/year_agg.csv'
+from data_loading import load_aggregate
+
+INPUT_TABLE = 'year_agg'
 OUTPUT_FILE = 'national_trend.html'
 
 def build_national_trend():
 	# Load aggregated year data
-	df = pd.read_csv(INPUT_FILE)
+	df = load_aggregate(INPUT_TABLE)
 	# Ensure expected columns exist
 	required = {'Season/Survey Year','avg_vaccination_rate','avg_ci_lower','avg_ci_upper'}
 	missing = required - set(df.columns)
 	if missing:
-		raise ValueError(f"Missing required columns in {INPUT_FILE}: {missing}")
+		raise ValueError(f"Missing required columns in {INPUT_TABLE}: {missing}")
 
 	# Sort by year
 	df = df.sort_values('Season/Survey Year').reset_index(drop=True)
@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregate_tables import AGGREGATION_COLUMNS, GEO_TABLES
+from data_loading import (AGGREGATED_DIR, CLEANED_STORE, YEAR_COLUMN, load_aggregate,
+                          read_cleaned_store, replace_partitions, write_partitioned)
+from geo_hierarchy import STATE_FIPS, add_geo_columns, add_state_columns
+from rollup_engine import CI_COLUMNS, SUM_COLUMNS, GrainStats
+
+# Stored next to the aggregate tables as aggregated_data/cube.parquet, partitioned by season
+CUBE_NAME = 'cube'
+# Cell grain; the state and region dimensions are derived from the county FIPS code
+CELL_KEYS = ['FIPS', YEAR_COLUMN, 'Dimension Type', 'Dimension']
+# Short names queries may use for the cube's dimensions
+DIMENSIONS = {
+    'state': STATE_FIPS,
+    'postal': 'Postal',
+    'census_region': 'Census Region',
+    'hhs_region': 'HHS Region',
+    'fips': 'FIPS',
+    'year': YEAR_COLUMN,
+    'dimension_type': 'Dimension Type',
+    'dimension': 'Dimension',
+}
+# Mergeable measures of each cell
+SUMS = SUM_COLUMNS + ['value_sumsq']
+
+
+def build_cube_cells(stats):
+    """
+    Cube cells from a GrainStats: one per (county FIPS, season, dimension type,
+    dimension) with the additive sums, min and max of the estimate, and the
+    county name and geographic hierarchy (geo_hierarchy.GEO_COLUMNS) as
+    attributes. Rows without a FIPS code keep cells of their own so national
+    roll-ups still count them.
+    """
+    cells = stats.partials(CELL_KEYS, [('Geography', 'first')], histogram=False, dropna=False)
+    cells = cells.reset_index().rename(columns={'Geography_first': 'Geography'})
+    return add_geo_columns(cells)
+
+
+def _column(dimension):
+    return DIMENSIONS.get(dimension, dimension)
+
+
+class FluCube:
+    """
+    Materialized OLAP cube of the cleaned data over (census or HHS region,
+    state, county FIPS, season year, dimension type, dimension).
+
+    Each cell holds mergeable sums of the estimate and its confidence interval,
+    so any grouping of the cube's dimensions is a roll-up of cells rather than a
+    pass over the cleaned rows; means, spreads and counts are identical to
+    grouping the rows. Medians are not mergeable from sums; they stay in the
+    published aggregate tables.
+
+        cube = load_cube()
+        age = cube.slice(dimension_type='Age', year=[2020, 2021])
+        age.rollup(['year', 'dimension'])
+
+    Dimensions can be named by their short names (census_region, hhs_region,
+    state, postal, fips, year, dimension_type, dimension) or by column name;
+    'Geography' (county name) and 'State' can also be grouped on.
+    """
+
+    def __init__(self, cells):
+        # Cubes materialized before the region dimensions existed get them here
+        self.cells = add_geo_columns(cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def slice(self, **filters):
+        """
+        Cube restricted to cells whose dimensions match: a scalar keeps one value
+        and a list keeps any of its values, e.g. slice(state=6, year=[2022, 2023])
+        """
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, value in filters.items():
+            values = self.cells[_column(dimension)]
+            if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+                mask &= values.isin(list(value)).to_numpy()
+            else:
+                mask &= (values == value).fillna(False).to_numpy(dtype=bool)
+        return FluCube(self.cells[mask])
+
+    def rollup(self, by=(), county_count=False):
+        """
+        Roll the cells up to the dimensions in `by` (the whole cube when empty).
+
+        Returns one row per group, sorted by `by`, with record_count,
+        avg_vaccination_rate, std_vaccination_rate, min/max_vaccination_rate and
+        avg_ci_lower/upper; county_count=True adds the number of distinct counties.
+        """
+        columns = [_column(d) for d in by]
+        if columns:
+            grouped = self.cells.groupby(columns, observed=True, sort=True)
+            sums = grouped[SUMS].sum()
+            extremes = grouped[['value_min', 'value_max']].agg({'value_min': 'min', 'value_max': 'max'})
+            counties = grouped['FIPS'].nunique() if county_count else None
+        else:
+            sums = self.cells[SUMS].sum().to_frame().T
+            extremes = pd.DataFrame({'value_min': [self.cells['value_min'].min()],
+                                     'value_max': [self.cells['value_max'].max()]})
+            counties = pd.Series([self.cells['FIPS'].nunique()]) if county_count else None
+
+        n = sums['n'].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums['value_sum'].to_numpy() / np.where(n > 0, n, np.nan)
+            m2 = np.maximum(sums['value_sumsq'].to_numpy() - sums['value_sum'].to_numpy() * mean, 0)
+            result = pd.DataFrame({
+                'avg_vaccination_rate': mean,
+                'std_vaccination_rate': np.sqrt(m2 / np.where(n > 1, n - 1, np.nan)),
+                'min_vaccination_rate': extremes['value_min'].to_numpy(),
+                'max_vaccination_rate': extremes['value_max'].to_numpy(),
+                'record_count': n,
+            }, index=sums.index)
+            for col in CI_COLUMNS:
+                ci_n = sums[f'{col}_n'].to_numpy()
+                result[f'avg_{col}'] = sums[f'{col}_sum'].to_numpy() / np.where(ci_n > 0, ci_n, np.nan)
+        if county_count:
+            result['county_count'] = counties.to_numpy()
+        return result.reset_index() if columns else result.reset_index(drop=True)
+
+
+def write_cube(cells, data_dir=AGGREGATED_DIR, years=None):
+    """
+    Materialize cube cells (build_cube_cells) into <data_dir>/cube.parquet.
+
+    With `years` only those season partitions are replaced (the cells must cover
+    exactly those seasons); otherwise the cube is rewritten. Returns the cell count.
+    """
+    path = os.path.join(data_dir, f'{CUBE_NAME}.parquet')
+    if years is None:
+        write_partitioned(cells, path)
+    else:
+        replace_partitions(cells, path, years)
+    return len(cells)
+
+
+def update_cube(years, cleaned_path=CLEANED_STORE, data_dir=AGGREGATED_DIR):
+    """Rebuild only the cube cells of the given seasons from the cleaned store"""
+    df = read_cleaned_store(AGGREGATION_COLUMNS, years=years, store_path=cleaned_path)
+    return write_cube(build_cube_cells(GrainStats(df)), data_dir, years)
+
+
+def load_cube(years=None, states=None, data_dir=AGGREGATED_DIR, cleaned_path=CLEANED_STORE):
+    """
+    Load the materialized cube, reading only the requested seasons and states.
+
+    When it has not been materialized yet (data_aggregation.py writes it), the
+    cube is built in memory from the cleaned store instead.
+    """
+    if os.path.isdir(os.path.join(data_dir, f'{CUBE_NAME}.parquet')):
+        return FluCube(load_aggregate(CUBE_NAME, years=years, states=states, data_dir=data_dir))
+    df = read_cleaned_store(AGGREGATION_COLUMNS, years=years, states=states, store_path=cleaned_path)
+    return FluCube(build_cube_cells(GrainStats(df)))
+
+
+def geo_table(cube, name):
+    """
+    One geographic roll-up table (aggregate_tables.GEO_TABLES) of the cube, rounded
+    like the published tables; state tables carry the state names and regions
+    """
+    table = cube.rollup(GEO_TABLES[name], county_count=True).round(2)
+    if STATE_FIPS in table.columns:
+        table = add_state_columns(table)
+    return table
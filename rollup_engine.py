@@ -0,0 +1,611 @@
+import numpy as np
+import pandas as pd
+
+# Finest grain of the published tables. Geography is kept next to FIPS for the county
+# dimension table (the first name of each FIPS code); the county tables are keyed by FIPS.
+GRAIN = ['Geography', 'FIPS', 'Season/Survey Year', 'Dimension Type', 'Dimension']
+SEASON = 'Season/Survey Year'
+VALUE = 'Estimate (%)'
+CI_COLUMNS = ['ci_lower', 'ci_upper']
+# Additive statistics kept per grain cell; every table sums them
+SUM_COLUMNS = ['n', 'value_sum'] + [f'{col}_{stat}' for col in CI_COLUMNS for stat in ('sum', 'n')]
+
+# A season's cells are only merged when that at least halves its rows; CDC extracts
+# hold about one row per grain cell, and then merging costs more than it saves.
+# Deciding per season keeps the cells of a season independent of the others.
+MIN_COMPRESSION = 2
+# Largest groups x distinct-values histogram used for medians (8 bytes per bin)
+MAX_HISTOGRAM_BINS = 20_000_000
+# Key combinations per cell up to which groups are numbered with a presence table
+# (one byte per combination) instead of hashing the combined codes
+DENSE_GROUPS_PER_CELL = 4
+# Default bin width, in percentage points, of the quantile sketch: sketched medians
+# and percentiles are within half a bin (0.25 points) of the exact ones
+SKETCH_BIN_WIDTH = 0.5
+
+
+def quantile_of(stat):
+    """The quantile a statistic name stands for ('median' -> 0.5, 'p90' -> 0.9), else None"""
+    if stat == 'median':
+        return 0.5
+    if stat.startswith('p') and stat[1:].isdigit():
+        return int(stat[1:]) / 100
+    return None
+
+
+def snap_to_bins(values, bin_width):
+    """
+    Round values to the nearest multiple of bin_width: the quantile sketch.
+
+    Rounding is monotone, so any quantile of the snapped values is within
+    bin_width / 2 of the same quantile of the exact values, and a group's
+    histogram over [0, 100] needs at most 100 / bin_width + 1 counters however
+    many rows it covers. Histograms of disjoint rows merge by adding counts.
+    """
+    return np.round(np.asarray(values, dtype='float64') / bin_width) * bin_width
+
+
+def _sorted_codes(series):
+    """
+    Codes (-1 for missing) and sorted uniques of a column. Categoricals keep their
+    codes (with the categories put in sorted order) and integers spanning a small
+    range are coded by offset, so only the other columns are hashed.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        dtype = series.dtype
+        if not series.cat.categories.is_monotonic_increasing:
+            series = series.cat.reorder_categories(series.cat.categories.sort_values())
+        return series.cat.codes.to_numpy(), pd.Categorical(series.cat.categories, dtype=dtype)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        present = series.notna().to_numpy()
+        values = series.to_numpy(dtype='int64', na_value=0)
+        if present.any():
+            low = values[present].min()
+            span = values[present].max() - low + 1
+            if span <= max(DENSE_GROUPS_PER_CELL * len(values), 1 << 16):
+                offsets = np.where(present, values - low, 0)
+                seen = np.zeros(span, dtype=bool)
+                seen[offsets[present]] = True
+                rank = np.cumsum(seen) - 1
+                uniques = pd.array(np.flatnonzero(seen) + low).astype(series.dtype)
+                return np.where(present, rank[offsets], -1), uniques
+    return pd.factorize(series, sort=True)
+
+
+def _combine_codes(code_columns, cardinalities):
+    """Combine per-column codes into one int64 code that sorts like the key tuples"""
+    if np.prod([float(c) for c in cardinalities]) >= 2 ** 62:
+        raise OverflowError('too many key combinations to encode in int64')
+    return np.ravel_multi_index(code_columns, cardinalities)
+
+
+def _dense_groups(combined, size):
+    """
+    Group numbers (0..n-1 in code order) of combined codes below `size`, and each
+    group's code; a small code range is numbered through a presence table
+    instead of hashing
+    """
+    if size > max(DENSE_GROUPS_PER_CELL * len(combined), 1 << 16):
+        return pd.factorize(combined, sort=True)
+    seen = np.zeros(int(size), dtype=bool)
+    seen[combined] = True
+    rank = np.cumsum(seen) - 1
+    return rank[combined], np.flatnonzero(seen)
+
+
+class GrainStats:
+    """
+    Sufficient statistics of the cleaned rows at the finest grain, from one scan.
+
+    Each grain column and the estimate are factorized once into sorted integer
+    codes (0 marks a missing value) and the rows are reduced to cells, one per
+    distinct (GRAIN, estimate value) when that compresses the season's rows (see
+    MIN_COMPRESSION; otherwise each row is its own cell), holding the estimate
+    count and sum and the interval sums and counts. Keeping the estimate value
+    in the cell makes it a per-grain value histogram, so counts, means, spreads,
+    extremes and exact medians of any coarser grouping follow from the cells;
+    tables are rolled up with integer arithmetic on the codes instead of
+    re-grouping the text keys.
+
+        stats = GrainStats(df)
+        county = stats.rollup(['Geography'], ('mean', 'median', 'p90', 'count'))
+
+    With quantile_bin_width set, medians and percentiles come from the
+    fixed-width sketch of snap_to_bins instead of the exact values.
+
+    Cells stay in order of first appearance, so sums add values in input order
+    and match a groupby over the rows. GrainStats of separate seasons combine
+    into the GrainStats of all their rows with from_parts.
+    """
+
+    def __init__(self, df, quantile_bin_width=None):
+        self.quantile_bin_width = quantile_bin_width
+        self.columns = GRAIN + [VALUE]
+        self.uniques = {}
+        codes = {}
+        for col in self.columns:
+            col_codes, uniques = _sorted_codes(df[col])
+            codes[col] = col_codes.astype('int64') + 1
+            self.uniques[col] = pd.Series(uniques)
+        self.rows = len(df)
+        # Per-season float totals of rolled-up tables, by the keys they are totals of
+        self._season_totals = {}
+
+        value = self.uniques[VALUE].to_numpy(dtype='float64', na_value=np.nan)
+        columns = dict(codes)
+        columns['n'] = (codes[VALUE] > 0).astype('int64')
+        columns['value_sum'] = np.concatenate([[0.0], value])[codes[VALUE]]
+        for col in CI_COLUMNS:
+            bound = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            missing = np.isnan(bound)
+            columns[f'{col}_sum'] = np.where(missing, 0.0, bound)
+            columns[f'{col}_n'] = (~missing).astype('int64')
+        # The arrays are new: building the frame without copying them halves its cost
+        cells = pd.DataFrame(columns, copy=False)
+
+        season = codes[SEASON]
+        n_seasons = len(self.uniques[SEASON]) + 1
+        season_rows = np.bincount(season, minlength=n_seasons)
+        distinct_keys = self._distinct_keys(codes, n_seasons)
+        if (distinct_keys * MIN_COMPRESSION > season_rows)[season_rows > 0].all():
+            # No season can compress: every row stays its own cell
+            self.cells = cells
+            return
+        cell = _combine_codes([codes[col] for col in self.columns],
+                              [len(self.uniques[col]) + 1 for col in self.columns])
+        # factorize numbers cells in order of first appearance
+        inverse, cell_ids = pd.factorize(cell)
+        first_rows = _first_rows(inverse, len(cell_ids))
+        merge_row = (np.bincount(season[first_rows], minlength=n_seasons) * MIN_COMPRESSION
+                     <= season_rows)[season]
+        if merge_row.any():
+            if not merge_row.all():
+                # Rows of seasons that do not compress stay cells of their own
+                unmerged = len(cell_ids) + np.arange(len(cell))
+                inverse, cell_ids = pd.factorize(np.where(merge_row, inverse, unmerged))
+                first_rows = _first_rows(inverse, len(cell_ids))
+            merged = cells.iloc[first_rows][self.columns].reset_index(drop=True)
+            for col in SUM_COLUMNS:
+                totals = np.bincount(inverse, weights=cells[col].to_numpy(), minlength=len(cell_ids))
+                merged[col] = totals.astype(cells[col].dtype)
+            cells = merged
+        self.cells = cells
+
+    def _distinct_keys(self, codes, n_seasons):
+        """
+        Per season, a lower bound on its distinct cells found without hashing: its
+        distinct (FIPS, dimension) keys, or its distinct FIPS codes when their
+        presence table would be too large
+        """
+        dimension_width = len(self.uniques['Dimension']) + 1
+        dimension, dimension_codes = _dense_groups(
+            codes['Dimension Type'] * dimension_width + codes['Dimension'],
+            (len(self.uniques['Dimension Type']) + 1) * dimension_width)
+        n_dimensions = len(dimension_codes)
+        fips_width = len(self.uniques['FIPS']) + 1
+        if n_seasons * fips_width * n_dimensions > MAX_HISTOGRAM_BINS:
+            dimension, n_dimensions = 0, 1
+        seen = np.zeros(n_seasons * fips_width * n_dimensions, dtype=bool)
+        seen[(codes[SEASON] * fips_width + codes['FIPS']) * n_dimensions + dimension] = True
+        return seen.reshape(n_seasons, -1).sum(axis=1)
+
+    @classmethod
+    def from_parts(cls, parts):
+        """
+        Combine GrainStats of disjoint sets of seasons, given in the order their
+        rows were read, into the GrainStats of all their rows.
+
+        Cells never span seasons and are merged per season, so re-coding each
+        part's cells to the combined uniques and concatenating them reproduces
+        the cells of a single scan exactly, and every table rolled up from the
+        result is identical to the serial one.
+        """
+        if len({part.quantile_bin_width for part in parts}) > 1:
+            raise ValueError('parts were built with different quantile bin widths')
+        stats = cls.__new__(cls)
+        stats.quantile_bin_width = parts[0].quantile_bin_width
+        stats.columns = GRAIN + [VALUE]
+        stats.rows = sum(part.rows for part in parts)
+        stats._season_totals = {}
+        stats.uniques = {}
+        frames = [part.cells.copy() for part in parts]
+        for col in stats.columns:
+            part_uniques = [part.uniques[col] for part in parts]
+            codes, uniques = _sorted_codes(pd.concat(part_uniques, ignore_index=True))
+            if isinstance(part_uniques[0].dtype, pd.CategoricalDtype) and not isinstance(
+                    uniques.dtype, pd.CategoricalDtype):
+                # Parts with different categories concatenate as plain values
+                uniques = pd.Categorical(uniques, categories=uniques)
+            stats.uniques[col] = pd.Series(uniques)
+            offsets = np.cumsum([0] + [len(u) for u in part_uniques])
+            for frame, start, end in zip(frames, offsets[:-1], offsets[1:]):
+                recode = np.concatenate([[0], codes[start:end].astype('int64') + 1])
+                frame[col] = recode[frame[col].to_numpy()]
+        stats.cells = pd.concat(frames, ignore_index=True)
+        return stats
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _values(self, col, codes):
+        """Map codes (0 or NaN for missing) back to the column's values"""
+        codes = pd.Series(codes)
+        labels = codes.where(codes > 0) - 1
+        if labels.isna().any():
+            return self.uniques[col].reindex(labels).array
+        return self.uniques[col].take(labels.astype('int64')).array
+
+    def _value_histogram(self, group, n_groups, cells):
+        """Dense groups x distinct estimate values matrix of counts, or None if too large"""
+        n_values = len(self.uniques[VALUE])
+        if n_groups * n_values > MAX_HISTOGRAM_BINS:
+            return None
+        n = cells['n'].to_numpy()
+        bins = group * n_values + cells[VALUE].to_numpy() - 1
+        if ((n == 1) | (n == 0)).all():
+            # Unmerged cells hold one estimate or none: count the cells with one
+            counts = np.bincount(bins[n > 0], minlength=n_groups * n_values)
+        else:
+            counts = np.bincount(bins[n > 0], weights=n[n > 0], minlength=n_groups * n_values)
+        return counts.reshape(n_groups, n_values)
+
+    def _group(self, keys, dropna=True):
+        """
+        Cells with every key present (all cells with dropna=False, missing keys
+        then forming groups of their own), their dense group numbers and the
+        groups' combined codes
+        """
+        cells = self.cells
+        if dropna:
+            present = np.logical_and.reduce([cells[k].to_numpy() > 0 for k in keys])
+            if not present.all():
+                cells = cells[present]
+        cardinalities = [len(self.uniques[k]) + 1 for k in keys]
+        group, group_codes = _dense_groups(
+            _combine_codes([cells[k].to_numpy() for k in keys], cardinalities),
+            np.prod([float(c) for c in cardinalities]))
+        return cells, group, group_codes, cardinalities
+
+    def _index(self, keys, group_codes, cardinalities):
+        key_codes = np.unravel_index(group_codes, cardinalities)
+        levels = [self._values(k, codes) for k, codes in zip(keys, key_codes)]
+        if len(keys) == 1:
+            return pd.Index(levels[0], name=keys[0])
+        return pd.MultiIndex.from_arrays(levels, names=keys)
+
+    def _sums(self, keys, cells, group, group_codes, squares=False):
+        """
+        Per-group totals of the additive columns (and of the squared estimates
+        when asked). Counts are added with bincount; float sums go through
+        groupby, whose compensated summation the published rounding relies on.
+        Groups spanning seasons add their per-season totals in season order,
+        as stats_store.merge_partials adds the per-season partials, so tables
+        merged from partials are bit-identical to the rolled-up ones. Those
+        season totals are kept for a later table keyed by keys + [SEASON]
+        (county_year_agg after county_agg), whose float sums they are.
+        """
+        n_groups = len(group_codes)
+        counts = [col for col in SUM_COLUMNS if cells[col].dtype.kind == 'i']
+        float_columns = [col for col in SUM_COLUMNS if col not in counts] + (['value_sumsq'] if squares else [])
+        cached = self._season_totals.get(tuple(keys))
+        if cached is not None and set(float_columns) <= set(cached[1].columns) and np.array_equal(
+                cached[0], group_codes):
+            sums = cached[1][float_columns].copy()
+        else:
+            floats = cells[[col for col in SUM_COLUMNS if col not in counts]]
+            if squares:
+                value = np.concatenate([[0.0], self._value_array()])[cells[VALUE].to_numpy()]
+                floats = floats.assign(value_sumsq=value ** 2 * cells['n'].to_numpy())
+            if SEASON in keys:
+                sums = _group_sum(floats, group, n_groups)
+            else:
+                # Season totals are numbered by group, then season: each group's in season order
+                width = len(self.uniques[SEASON]) + 1
+                season_group, season_codes = _dense_groups(group * width + cells[SEASON].to_numpy(),
+                                                           n_groups * width)
+                season_sums = _group_sum(floats, season_group, len(season_codes))
+                self._season_totals[tuple(keys) + (SEASON,)] = (
+                    group_codes[season_codes // width] * width + season_codes % width, season_sums)
+                sums = _group_sum(season_sums, season_codes // width, n_groups)
+        for col in counts:
+            sums[col] = np.bincount(group, weights=cells[col].to_numpy(),
+                                    minlength=n_groups).astype(cells[col].dtype)
+        return sums[SUM_COLUMNS + (['value_sumsq'] if squares else [])]
+
+    def _other(self, col, func, cells, group, n_groups):
+        """Per-group min, max or first of a grain column's values (missing where a group has none)"""
+        codes = cells[col].to_numpy()
+        width = len(self.uniques[col]) + 1
+        if func in ('min', 'max') and n_groups * width <= MAX_HISTOGRAM_BINS:
+            # Codes sort like values: the extreme code present in each group's row of a table
+            seen = np.zeros(n_groups * width, dtype=bool)
+            seen[group * width + codes] = True
+            seen = seen.reshape(n_groups, width)
+            seen[:, 0] = False
+            found = seen[:, ::-1].argmax(axis=1) if func == 'max' else seen.argmax(axis=1)
+            result = width - 1 - found if func == 'max' else found
+            return self._values(col, np.where(seen.any(axis=1), result, 0))
+        present = codes > 0
+        result = np.zeros(n_groups, dtype='int64')
+        if func == 'first':
+            # Assigned in reverse, the last write to each group is its first present cell
+            result[group[present][::-1]] = codes[present][::-1]
+            return self._values(col, result)
+        reduced = pd.Series(codes[present]).groupby(group[present]).agg(func)
+        result[reduced.index] = reduced.to_numpy()
+        return self._values(col, result)
+
+    def _nunique(self, col, cells, group, n_groups):
+        """Per-group count of a grain column's distinct values"""
+        codes = cells[col].to_numpy()
+        width = len(self.uniques[col]) + 1
+        pairs = group * width + codes
+        if n_groups * width <= MAX_HISTOGRAM_BINS:
+            seen = np.zeros(n_groups * width, dtype=bool)
+            seen[pairs] = True
+            # Column 0 of each group's row marks missing values, which are not counted
+            return seen.reshape(n_groups, width)[:, 1:].sum(axis=1)
+        pairs = pd.unique(pairs[codes > 0])
+        return np.bincount(pairs // width, minlength=n_groups)
+
+    def _value_array(self):
+        return self.uniques[VALUE].to_numpy(dtype='float64', na_value=np.nan)
+
+    def _quantile_values(self):
+        """Value of each estimate code that quantiles are taken over (snapped in sketch mode)"""
+        values = self._value_array()
+        if self.quantile_bin_width is None:
+            return values
+        return snap_to_bins(values, self.quantile_bin_width)
+
+    def rollup(self, keys, stats_for=('mean', 'count'), others=()):
+        """
+        Derive one grouped table from the grain cells.
+
+        Returns a frame indexed by `keys` with columns named like a
+        groupby().agg() result flattened with '_' ('Estimate (%)_mean',
+        'ci_lower_mean', 'Geography_nunique', ...), in the same order, so the
+        published tables keep their renames:
+        - stats_for: estimate statistics among mean, median, std, min, max, count
+          and percentiles named pNN (p10, p90, ...), interpolated like
+          Series.quantile
+        - others: (grain column, func) pairs with func one of min, max, nunique
+          or first (first non-missing value in input order)
+        Cells with a missing key are dropped, as groupby does by default. The
+        interval means come with any estimate statistic.
+        """
+        cells, group, group_codes, cardinalities = self._group(keys)
+        n_groups = len(group_codes)
+        columns = {}
+        if stats_for:
+            self._estimate_columns(columns, keys, stats_for, cells, group, group_codes)
+
+        for col, func in others:
+            if func == 'nunique':
+                columns[f'{col}_nunique'] = self._nunique(col, cells, group, n_groups)
+            else:
+                columns[f'{col}_{func}'] = self._other(col, func, cells, group, n_groups)
+
+        return pd.DataFrame(columns, index=self._index(keys, group_codes, cardinalities))
+
+    def _estimate_columns(self, columns, keys, stats_for, cells, group, group_codes):
+        """Add the estimate statistics and the interval means of a rollup to `columns`"""
+        n_groups = len(group_codes)
+        sums = self._sums(keys, cells, group, group_codes, squares='std' in stats_for)
+        n = sums['n'].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums['value_sum'].to_numpy() / np.where(n > 0, n, np.nan)
+
+        values = self._value_array()
+        histogram = entries = None
+        if any(stat in ('min', 'max') or quantile_of(stat) is not None for stat in stats_for):
+            histogram = self._value_histogram(group, n_groups, cells)
+            if histogram is None:
+                entries = _value_entries(group, cells, len(values))
+
+        for stat in stats_for:
+            if stat == 'mean':
+                columns[f'{VALUE}_mean'] = mean
+            elif stat == 'count':
+                columns[f'{VALUE}_count'] = n
+            elif stat in ('min', 'max'):
+                columns[f'{VALUE}_{stat}'] = _extreme(stat, values, histogram, entries, n_groups)
+            elif quantile_of(stat) is not None:
+                columns[f'{VALUE}_{stat}'] = _quantile(
+                    quantile_of(stat), histogram, entries, self._quantile_values(), n_groups)
+            elif stat == 'std':
+                columns[f'{VALUE}_std'] = std_from_sums(n, sums['value_sum'].to_numpy(),
+                                                        sums['value_sumsq'].to_numpy())
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for col in CI_COLUMNS:
+                ci_n = sums[f'{col}_n'].to_numpy()
+                columns[f'{col}_mean'] = sums[f'{col}_sum'].to_numpy() / np.where(ci_n > 0, ci_n, np.nan)
+
+    def partials(self, keys, others=(), histogram=True, dropna=True):
+        """
+        Mergeable per-group partial aggregates for `keys`.
+
+        Columns: the additive SUM_COLUMNS plus value_sumsq, value_min and
+        value_max; `{col}_{func}` for (col, min/max/first) in `others` and
+        `{col}_members` (array of the distinct values) for (col, nunique); with
+        histogram=True, `values` and `value_counts` arrays holding the estimate
+        histogram that medians and percentiles are merged from (over the
+        sketch bins when quantile_bin_width is set). Partials of disjoint row
+        sets combine by adding sums and counts, taking min/max, uniting members
+        and adding histograms. With dropna=False, cells with missing keys are
+        kept as groups of their own.
+        """
+        cells, group, group_codes, cardinalities = self._group(keys, dropna)
+        n_groups = len(group_codes)
+        partials = self._sums(keys, cells, group, group_codes, squares=True)
+
+        values = self._value_array()
+        value_histogram = self._value_histogram(group, n_groups, cells)
+        entries = _value_entries(group, cells, len(values)) if value_histogram is None else None
+        for stat in ('min', 'max'):
+            partials[f'value_{stat}'] = _extreme(stat, values, value_histogram, entries, n_groups)
+
+        for col, func in others:
+            if func != 'nunique':
+                partials[f'{col}_{func}'] = self._other(col, func, cells, group, n_groups)
+                continue
+            codes = cells[col].to_numpy()
+            present = codes > 0
+            width = len(self.uniques[col]) + 1
+            pairs = np.sort(pd.unique(group[present] * width + codes[present]))
+            members = self._values(col, pairs % width)
+            partials[f'{col}_members'] = _split_by_group(members, pairs // width, n_groups)
+
+        if histogram:
+            # Histogram over the distinct quantile values (sketch bins share one)
+            bin_codes, bin_values = pd.factorize(self._quantile_values(), sort=True)
+            width = len(bin_values)
+            counted = cells['n'].to_numpy() > 0
+            pairs = group[counted] * width + bin_codes[cells[VALUE].to_numpy()[counted] - 1]
+            inverse, bins = pd.factorize(pairs)
+            counts = np.bincount(inverse, weights=cells['n'].to_numpy()[counted]).astype('int64')
+            order = np.argsort(bins)
+            bins, counts = bins[order], counts[order]
+            partials['values'] = _split_by_group(bin_values[bins % width], bins // width, n_groups)
+            partials['value_counts'] = _split_by_group(counts, bins // width, n_groups)
+
+        partials.index = self._index(keys, group_codes, cardinalities)
+        return partials
+
+
+def std_from_sums(n, total, squares):
+    """
+    Sample standard deviation per group from its estimate count, sum and sum of
+    squares, the form partials merge in; NaN for groups with fewer than two values
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / np.where(n > 0, n, np.nan)
+        m2 = np.maximum(squares - total * mean, 0)
+        return np.sqrt(m2 / np.where(n > 1, n - 1, np.nan))
+
+
+def _first_rows(inverse, n_cells):
+    """Row number of the first row of each cell, for cells numbered in order of first appearance"""
+    # A row starts a cell exactly when its number exceeds every number before it
+    starts = np.empty(len(inverse), dtype=bool)
+    starts[:1] = True
+    starts[1:] = inverse[1:] > np.maximum.accumulate(inverse)[:-1]
+    return np.flatnonzero(starts)
+
+
+def _group_sum(frame, group, n_groups):
+    """
+    groupby sum by dense group numbers. A categorical key spares groupby re-hashing
+    them, and as every group is present no unobserved categories need dropping.
+    """
+    key = pd.Categorical.from_codes(group, categories=pd.RangeIndex(n_groups))
+    return frame.groupby(key, observed=False).sum().reset_index(drop=True)
+
+
+def _split_by_group(items, groups, n_groups):
+    """Split items sorted by group number into one array per group (empty where absent)"""
+    bounds = np.searchsorted(groups, np.arange(1, n_groups))
+    return pd.Series(np.split(np.asarray(items), bounds), dtype=object).to_numpy()
+
+
+def _value_entries(group, cells, n_values):
+    """
+    (group, value code, count) entries of the counted cells sorted by group and
+    value, for groups too many for a dense histogram: one argsort of a combined
+    key instead of a lexsort of the two
+    """
+    counts = cells['n'].to_numpy()
+    key = group * n_values + (cells[VALUE].to_numpy() - 1)
+    if not counts.all():
+        counted = counts > 0
+        key, counts = key[counted], counts[counted]
+    if (counts == 1).all():
+        # Unmerged cells: the entries are the sorted keys alone
+        key = np.sort(key)
+    else:
+        order = np.argsort(key)
+        key, counts = key[order], counts[order]
+    return key // n_values, key % n_values, counts
+
+
+def _extreme(stat, values, histogram, entries, n_groups):
+    """
+    Per-group min or max of the estimate from the dense histogram or the sorted
+    entries; NaN for groups without values
+    """
+    result = np.full(n_groups, np.nan)
+    # Codes sort like values, so the extreme code is the extreme value
+    if histogram is not None:
+        present = histogram > 0
+        has_values = present.any(axis=1)
+        if stat == 'min':
+            codes = present.argmax(axis=1)
+        else:
+            codes = present.shape[1] - 1 - present[:, ::-1].argmax(axis=1)
+        result[has_values] = values[codes[has_values]]
+        return result
+    groups, value_codes, _ = entries
+    sizes = np.bincount(groups, minlength=n_groups)
+    has_values = sizes > 0
+    ends = np.cumsum(sizes)
+    at = ends - sizes if stat == 'min' else ends - 1
+    result[has_values] = values[value_codes[at[has_values]]]
+    return result
+
+
+def _quantile(q, histogram, entries, values, n_groups):
+    """Per-group q-quantile of the estimate over `values` per code; NaN for groups without values"""
+    if histogram is None:
+        # Too many groups for a dense histogram: use the sorted (group, value) entries instead
+        return _quantile_sorted(entries, values, n_groups, q)
+
+    totals = histogram.sum(axis=1)
+    has_values = totals > 0
+    result = np.full(n_groups, np.nan)
+    cumulative = histogram[has_values].cumsum(axis=1)
+    lower_rank, upper_rank, fraction = _ranks(totals[has_values], q)
+    lower = (cumulative > lower_rank[:, None]).argmax(axis=1)
+    upper = (cumulative > upper_rank[:, None]).argmax(axis=1)
+    result[has_values] = _interpolate(values[lower], values[upper], fraction, q)
+    return result
+
+
+def _ranks(totals, q):
+    """0-based ranks of the values around the q-quantile of each group, and the fraction between them"""
+    position = (totals - 1) * q
+    lower = np.floor(position).astype('int64')
+    return lower, np.ceil(position).astype('int64'), position - lower
+
+
+def _interpolate(lower, upper, fraction, q):
+    # The median averages the two middle values exactly as Series.median does
+    if q == 0.5:
+        return (lower + upper) / 2
+    return lower + (upper - lower) * fraction
+
+
+def histogram_quantile(groups, values, counts, n_groups, q):
+    """
+    Per-group q-quantile from (group number, value, count) histogram entries,
+    which may repeat; NaN for groups without entries
+    """
+    value_codes, uniques = pd.factorize(values, sort=True)
+    order = np.lexsort((value_codes, groups))
+    histogram_rows = (groups[order], value_codes[order], counts[order])
+    return _quantile_sorted(histogram_rows, np.asarray(uniques, dtype='float64'), n_groups, q)
+
+
+def _quantile_sorted(histogram_rows, values, n_groups, q):
+    """Quantile from (group, value code, count) histogram entries sorted by group and value"""
+    groups, value_codes, counts = histogram_rows
+    end = np.cumsum(counts)
+    totals = np.bincount(groups, weights=counts, minlength=n_groups).astype('int64')
+    starts = np.concatenate([[0], np.cumsum(totals)[:-1]])
+    has_values = totals > 0
+    lower_rank, upper_rank, fraction = _ranks(totals[has_values], q)
+    result = np.full(n_groups, np.nan)
+    lower, upper = (np.searchsorted(end, starts[has_values] + rank, side='right')
+                    for rank in (lower_rank, upper_rank))
+    result[has_values] = _interpolate(values[value_codes[lower]], values[value_codes[upper]], fraction, q)
+    return result
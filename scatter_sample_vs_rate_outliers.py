@@ -2,7 +2,10 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
-INPUT_FILE = 'Flu_shot_cleaned.csv'
+from county_year import load_county_year
+from data_loading import CLEANED_STORE
+
+INPUT_FILE = CLEANED_STORE
 OUTPUT_FILE = 'sample_vs_rate_outliers.html'
 
 # Configuration
@@ -12,21 +15,6 @@ CI_WIDTH_OUTLIER_QUANTILE = 0.975  # top 2.5% widest CI
 TOP_LABELS = 5
 
 
-def aggregate_county_year(df: pd.DataFrame) -> pd.DataFrame:
-	grp = df.groupby(['Geography', 'FIPS', 'Season/Survey Year'], as_index=False).agg(
-		avg_rate=('Estimate (%)', 'mean'),
-		avg_ci_lower=('ci_lower', 'mean'),
-		avg_ci_upper=('ci_upper', 'mean'),
-		record_count=('Estimate (%)', 'count'),
-		sample_size_nonnull=('Sample Size', lambda s: s.dropna().sum())
-	)
-	grp['sample_size'] = grp['sample_size_nonnull'].replace(0, np.nan)
-	grp['sample_size'] = grp['sample_size'].fillna(grp['record_count'])
-	grp.drop(columns=['sample_size_nonnull'], inplace=True)
-	grp['ci_width'] = grp['avg_ci_upper'] - grp['avg_ci_lower']
-	return grp
-
-
 def detect_outliers(ds: pd.DataFrame) -> pd.DataFrame:
 	# Determine thresholds based on quantiles
 	low_thr = ds['avg_rate'].quantile(RATE_OUTLIER_QUANTILE)
@@ -93,9 +81,9 @@ def build_plot(ds: pd.DataFrame, year_label: str):
 
 
 def main():
-	print('Loading cleaned dataset...')
-	df = pd.read_csv(INPUT_FILE)
-	agg = aggregate_county_year(df)
+	print('Loading county-year metrics...')
+	agg = load_county_year(INPUT_FILE)
+	agg['ci_width'] = agg['avg_ci_upper'] - agg['avg_ci_lower']
 
 	if MOST_RECENT_ONLY:
 		year = int(agg['Season/Survey Year'].max())
@@ -1,26 +1,24 @@
-import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
 
-INPUT_FILE = 'Flu_shot_cleaned.csv'
+from olap_cube import load_cube
+
 OUTPUT_FILE = 'setting_proportions_stacked.html'
 
 SETTING_NAMES = ['Medical Setting', 'Non-Medical Setting', 'Pharmacy/Store', 'Workplace', 'School']
 
 
 def build_setting_proportions():
-	print('Loading cleaned dataset...')
-	df = pd.read_csv(INPUT_FILE)
+	print('Loading vaccination cube...')
+	cube = load_cube()
 
-	# Filter to rows that map to settings across all dimension types where available
-	mask = df['Dimension'].isin(SETTING_NAMES)
-	ds = df.loc[mask, ['Season/Survey Year', 'Dimension', 'Estimate (%)']].copy()
-	if ds.empty:
+	# Filter to cells that map to settings across all dimension types where available
+	settings = cube.slice(dimension=SETTING_NAMES)
+	if len(settings) == 0:
 		raise ValueError('No rows found for requested settings in the cleaned dataset.')
 
 	# Aggregate: average coverage by year and setting
-	agg = ds.groupby(['Season/Survey Year', 'Dimension'], as_index=False)['Estimate (%)'].mean()
-	agg.rename(columns={'Estimate (%)': 'avg_rate'}, inplace=True)
+	agg = settings.rollup(['year', 'dimension'])[['Season/Survey Year', 'Dimension', 'avg_vaccination_rate']]
+	agg = agg.rename(columns={'avg_vaccination_rate': 'avg_rate'})
 
 	# Pivot to wide with settings as columns
 	wide = agg.pivot(index='Season/Survey Year', columns='Dimension', values='avg_rate').reindex(columns=SETTING_NAMES)
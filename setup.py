@@ -20,16 +20,17 @@ def install_requirements():
 
 def check_data_files():
     """Check if required data files exist"""
+    # Each entry lists accepted alternatives: the Parquet output or its CSV form
     required_files = [
-        "Flu_shot_cleaned.csv",
-        "aggregated_data/county_agg.csv",
-        "aggregated_data/year_agg.csv"
+        ("Flu_shot_cleaned", "Flu_shot_cleaned.csv"),
+        ("aggregated_data/county_agg.parquet", "aggregated_data/county_agg.csv"),
+        ("aggregated_data/year_agg.parquet", "aggregated_data/year_agg.csv")
     ]
     
     missing_files = []
-    for file in required_files:
-        if not os.path.exists(file):
-            missing_files.append(file)
+    for alternatives in required_files:
+        if not any(os.path.exists(file) for file in alternatives):
+            missing_files.append(" or ".join(alternatives))
     
     if missing_files:
         print("❌ Missing required data files:")
@@ -1,9 +1,12 @@
+import warnings
+
 import pandas as pd
 import numpy as np
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
-INPUT_FILE = 'aggregated_data/county_year_agg.csv'
+from county_tensor import load_county_tensor
+
 OUTPUT_FILE = 'county_small_multiples.html'
 
 # Configuration
@@ -12,65 +15,60 @@ GRID_ROWS = 4
 GRID_COLS = 6
 
 
-def select_counties(df: pd.DataFrame, n: int) -> pd.Index:
+def select_counties(rates: np.ndarray, n: int) -> np.ndarray:
 	"""Select a representative set of counties with sufficient data across years.
 	Strategy: prefer counties with more years; then highest variance (interesting trends).
+	`rates` is the (county, year) rate array; returns county positions.
 	"""
-	years_per_county = df.groupby('Geography')['Season/Survey Year'].nunique()
-	var_per_county = df.groupby('Geography')['avg_vaccination_rate'].var().fillna(0)
-	summary = (
-		pd.concat([
-			years_per_county.rename('num_years'),
-			var_per_county.rename('rate_variance')
-		], axis=1)
-		.reset_index()
-	)
+	num_years = np.isfinite(rates).sum(axis=1)
+	with warnings.catch_warnings():
+		# Counties with fewer than two years have no variance
+		warnings.simplefilter('ignore', RuntimeWarning)
+		rate_variance = np.nan_to_num(np.nanvar(rates, axis=1, ddof=1))
+	summary = pd.DataFrame({'num_years': num_years, 'rate_variance': rate_variance})
 	# Score: prioritize many years, then higher variance
 	summary['score'] = summary['num_years'].rank(pct=True) * 0.7 + summary['rate_variance'].rank(pct=True) * 0.3
-	selected = summary.sort_values(['score','num_years','rate_variance'], ascending=False)['Geography'].head(n)
-	return selected
+	selected = summary.sort_values(['score','num_years','rate_variance'], ascending=False).index[:n]
+	return selected.to_numpy()
 
 
 def build_small_multiples():
-	# Load data
-	df = pd.read_csv(INPUT_FILE)
+	# Load the (county, year) rates of the county tensor; a county is one row
+	tensor = load_county_tensor()
+	rates = tensor.county_year()
+	years = tensor.years
 
 	# Compute national average per year
-	national = df.groupby('Season/Survey Year', as_index=False)['avg_vaccination_rate'].mean()
-	national.rename(columns={'avg_vaccination_rate': 'national_avg'}, inplace=True)
-
-	# Select counties to display
-	selected_counties = select_counties(df, NUM_COUNTIES)
-	df_sel = df[df['Geography'].isin(selected_counties)].copy()
-
-	# Merge national average for reference
-	df_sel = df_sel.merge(national, on='Season/Survey Year', how='left')
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning)
+		national = np.nanmean(rates, axis=0)
 
-	# Determine line color per county based on mean diff vs national
-	def county_color(sub: pd.DataFrame) -> str:
-		# Compare only overlapping years
-		if sub.empty:
-			return 'gray'
-		diff = (sub['avg_vaccination_rate'] - sub['national_avg']).mean()
-		return 'green' if diff >= 0 else 'crimson'
+	# Select counties to display (by FIPS code; names repeat across states)
+	selected_counties = select_counties(rates, NUM_COUNTIES)
+	names = [tensor.names[i] if tensor.names[i] is not None else str(tensor.fips[i]) for i in selected_counties]
 
-	county_to_color = {c: county_color(df_sel[df_sel['Geography'] == c]) for c in selected_counties}
+	# Determine line color per county based on mean diff vs national (overlapping years only)
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning)
+		diffs = np.nanmean(rates[selected_counties] - national, axis=1)
+	county_to_color = {i: ('crimson' if diff < 0 else 'green') if np.isfinite(diff) else 'gray'
+		for i, diff in zip(selected_counties, diffs)}
 
 	# Build subplot grid
 	fig = make_subplots(rows=GRID_ROWS, cols=GRID_COLS,
-		subplot_titles=[str(c) for c in selected_counties],
+		subplot_titles=names,
 		shared_xaxes=True, shared_yaxes=True)
 
 	# Add traces per county
 	row, col = 1, 1
-	for county in selected_counties:
-		sub = df_sel[df_sel['Geography'] == county].sort_values('Season/Survey Year')
-		color = county_to_color[county]
+	for i, county in zip(selected_counties, names):
+		present = np.isfinite(rates[i])
+		color = county_to_color[i]
 
 		# County line
 		fig.add_trace(
 			go.Scatter(
-				x=sub['Season/Survey Year'], y=sub['avg_vaccination_rate'],
+				x=years[present], y=rates[i, present],
 				mode='lines+markers', name=str(county),
 				line=dict(color=color, width=2), marker=dict(size=4),
 				hovertemplate=f'<b>{county}</b><br>Year: %{{x}}<br>Rate: %{{y:.1f}}%<extra></extra>'
@@ -79,10 +77,9 @@ def build_small_multiples():
 		)
 
 		# National average line (as thin gray line)
-		nat = national.copy()
 		fig.add_trace(
 			go.Scatter(
-				x=nat['Season/Survey Year'], y=nat['national_avg'],
+				x=years, y=national,
 				mode='lines', name='National Avg',
 				line=dict(color='gray', width=1, dash='dash'),
 				hovertemplate='Year: %{x}<br>National: %{y:.1f}%<extra></extra>',
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from aggregate_tables import AGGREGATE_TABLES, AGGREGATION_COLUMNS, aggregation_plan, finish_table, table_spec
+from data_loading import (AGGREGATED_DIR, CLEANED_STORE, COUNTY_NAMES, YEAR_COLUMN, load_aggregate,
+                          read_cleaned_store, replace_partitions, write_partitioned)
+from rollup_engine import (CI_COLUMNS, SUM_COLUMNS, VALUE, GrainStats, histogram_quantile, quantile_of,
+                           std_from_sums)
+
+# Per-season partial aggregates of every published table, one dataset per table
+STATS_STORE = os.path.join(AGGREGATED_DIR, 'partials')
+# Value -> bit position dictionaries of the distinct-count bitmaps
+MEMBERS_FILE = '_members.json'
+# How the partials were built; the value histograms of every season must agree
+SETTINGS_FILE = '_settings.json'
+
+
+def _load_json(name, store_path):
+    path = os.path.join(store_path, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(obj, name, store_path):
+    os.makedirs(store_path, exist_ok=True)
+    tmp_path = os.path.join(store_path, name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, os.path.join(store_path, name))
+
+
+def load_members(store_path=STATS_STORE):
+    return _load_json(MEMBERS_FILE, store_path)
+
+
+def save_members(members, store_path=STATS_STORE):
+    _save_json(members, MEMBERS_FILE, store_path)
+
+
+def store_bin_width(store_path=STATS_STORE):
+    """Quantile sketch bin width the store's histograms use, or None for exact values"""
+    return _load_json(SETTINGS_FILE, store_path).get('quantile_bin_width')
+
+
+def _bitmaps(member_arrays, dictionary):
+    """
+    Encode each array of distinct values as a bitmap over `dictionary`, a list of
+    values that is extended in place with unseen ones. Bit positions never change,
+    so bitmaps of different seasons merge with a bitwise OR and count exactly.
+    """
+    lengths = np.array([len(m) for m in member_arrays], dtype='int64')
+    flat = pd.Series(np.concatenate(member_arrays) if len(member_arrays) else [], dtype=object)
+    unseen = pd.unique(flat[~flat.isin(dictionary)])
+    dictionary.extend(v.item() if hasattr(v, 'item') else v for v in unseen)
+    bits = np.zeros((len(member_arrays), len(dictionary)), dtype=bool)
+    bits[np.repeat(np.arange(len(member_arrays)), lengths), pd.Index(dictionary).get_indexer(flat)] = True
+    return [row.tobytes() for row in np.packbits(bits, axis=1)]
+
+
+def _bitmap_counts(bitmaps, groups, n_groups):
+    """Number of distinct members per group from the union of its bitmaps"""
+    width = max((len(b) for b in bitmaps), default=0)
+    bytes_ = np.zeros((len(bitmaps), width), dtype='uint8')
+    for i, b in enumerate(bitmaps):
+        bytes_[i, :len(b)] = np.frombuffer(b, dtype='uint8')
+    union = np.zeros((n_groups, width), dtype='uint8')
+    np.bitwise_or.at(union, groups, bytes_)
+    return np.unpackbits(union, axis=1).sum(axis=1, dtype='int64')
+
+
+def table_partials(stats, name, members):
+    """Per-(group, season) partials of one published table from a GrainStats"""
+    keys, stats_for, others = AGGREGATE_TABLES[name]
+    partial_keys = keys if YEAR_COLUMN in keys else keys + [YEAR_COLUMN]
+    # Year min/max/nunique follow from the season key of the partials themselves
+    column_others = [(col, func) for col, func in others if col != YEAR_COLUMN]
+    partials = stats.partials(partial_keys, column_others, histogram='median' in stats_for)
+    for col, func in column_others:
+        if func == 'nunique':
+            partials[f'{col}_members'] = _bitmaps(partials[f'{col}_members'].to_numpy(), members.setdefault(col, []))
+    return partials.reset_index()
+
+
+def merge_partials(name, partials, percentiles=()):
+    """
+    Merge the per-season partials of one table into its rolled-up form: indexed
+    by the table's keys with the same flattened columns as GrainStats.rollup.
+    Season partials are added in season order, as the rollup adds its season
+    totals, so the merged tables are bit-identical to a full run.
+    """
+    keys, stats_for, others = table_spec(name, percentiles)
+    # Seasons in order, so 'first' picks the earliest season as a store read does
+    partials = partials.sort_values(YEAR_COLUMN, kind='stable')
+    grouped = partials.groupby(keys, observed=True, sort=True)
+    groups = grouped.ngroup().to_numpy()
+    n_groups = grouped.ngroups
+    sums = grouped[SUM_COLUMNS + ['value_sumsq']].sum()
+    n = sums['n'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums['value_sum'].to_numpy() / np.where(n > 0, n, np.nan)
+
+    columns = {}
+    for stat in stats_for:
+        if stat == 'mean':
+            columns[f'{VALUE}_mean'] = mean
+        elif stat == 'count':
+            columns[f'{VALUE}_count'] = n
+        elif stat in ('min', 'max'):
+            columns[f'{VALUE}_{stat}'] = grouped[f'value_{stat}'].agg(stat).to_numpy()
+        elif quantile_of(stat) is not None:
+            lengths = partials['values'].map(len).to_numpy()
+            columns[f'{VALUE}_{stat}'] = histogram_quantile(
+                np.repeat(groups, lengths),
+                np.concatenate(partials['values'].to_numpy()),
+                np.concatenate(partials['value_counts'].to_numpy()),
+                n_groups,
+                quantile_of(stat),
+            )
+        elif stat == 'std':
+            columns[f'{VALUE}_std'] = std_from_sums(n, sums['value_sum'].to_numpy(),
+                                                    sums['value_sumsq'].to_numpy())
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for col in CI_COLUMNS:
+            ci_n = sums[f'{col}_n'].to_numpy()
+            columns[f'{col}_mean'] = sums[f'{col}_sum'].to_numpy() / np.where(ci_n > 0, ci_n, np.nan)
+
+    for col, func in others:
+        if col == YEAR_COLUMN:
+            columns[f'{col}_{func}'] = grouped[col].agg(func).to_numpy()
+        elif func == 'nunique':
+            columns[f'{col}_nunique'] = _bitmap_counts(partials[f'{col}_members'].to_numpy(), groups, n_groups)
+        else:
+            columns[f'{col}_{func}'] = grouped[f'{col}_{func}'].agg(func).array
+
+    return pd.DataFrame(columns, index=sums.index)
+
+
+def update_stats_store(years=None, cleaned_path=CLEANED_STORE, store_path=STATS_STORE, stats=None,
+                       quantile_bin_width=None):
+    """
+    Merge the partials of the given seasons into the store.
+
+    Only those seasons are read from the cleaned store and only their partitions
+    of each table's partials are replaced; years=None rebuilds the whole store.
+    A GrainStats of exactly those seasons can be passed to skip the read.
+    With quantile_bin_width the value histograms are kept as fixed-width
+    quantile sketches (bounded size, quantiles within half a bin); a season
+    update reuses the width the store was built with.
+    Returns the number of partial rows written.
+    """
+    rebuild = years is None
+    if stats is not None:
+        quantile_bin_width = stats.quantile_bin_width
+    if not rebuild:
+        built_with = store_bin_width(store_path)
+        if quantile_bin_width is None:
+            quantile_bin_width = built_with
+        elif quantile_bin_width != built_with:
+            raise ValueError(f'{store_path} was built with quantile bin width {built_with}; '
+                             f'rebuild it to use {quantile_bin_width}')
+    if stats is None:
+        stats = GrainStats(read_cleaned_store(AGGREGATION_COLUMNS, years=years, store_path=cleaned_path),
+                           quantile_bin_width)
+    if rebuild and os.path.isdir(store_path):
+        shutil.rmtree(store_path)
+    members = {} if rebuild else load_members(store_path)
+
+    written = 0
+    for name in AGGREGATE_TABLES:
+        partials = table_partials(stats, name, members)
+        path = os.path.join(store_path, f'{name}.parquet')
+        if rebuild:
+            write_partitioned(partials, path)
+        else:
+            replace_partitions(partials, path, years)
+        written += len(partials)
+    save_members(members, store_path)
+    _save_json({'quantile_bin_width': quantile_bin_width}, SETTINGS_FILE, store_path)
+    return written
+
+
+def aggregates_from_store(names=None, store_path=STATS_STORE, percentiles=()):
+    """
+    Publish tables (all by default) from the merged partials, without reading
+    cleaned rows; `percentiles` (e.g. (10, 90)) adds pNN_vaccination_rate columns
+    """
+    names = list(names or AGGREGATE_TABLES)
+    tables = {}
+    # County tables need the county names merged first
+    for name in aggregation_plan(names):
+        if name in AGGREGATE_TABLES:
+            partials = load_aggregate(name, data_dir=store_path)
+            tables[name] = finish_table(name, merge_partials(name, partials, percentiles),
+                                        tables.get(COUNTY_NAMES))
+    return {name: tables[name] for name in names}
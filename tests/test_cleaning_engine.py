@@ -0,0 +1,24 @@
+import numpy as np
+
+from benchmarks import make_synthetic_raw
+from cleaning_engine import incremental_clean_flu_data
+from data_loading import YEAR_COLUMN, list_years, read_cleaned_store
+
+
+def test_incremental_clean_drops_season_that_cleans_to_nothing(tmp_path):
+    raw_path = str(tmp_path / 'Flu_shot.csv')
+    store = str(tmp_path / 'store')
+    raw = make_synthetic_raw(3000, seed=1)
+    raw.to_csv(raw_path, index=False)
+    incremental_clean_flu_data(raw_path, store)
+    assert 2015 in list_years(store)
+
+    # A revised release suppresses every estimate of one season
+    in_2015 = raw['Season/Survey Year'].str.startswith('2015').to_numpy()
+    raw.loc[in_2015, 'Estimate (%)'] = np.nan
+    raw.to_csv(raw_path, index=False)
+    result = incremental_clean_flu_data(raw_path, store)
+
+    assert result['seasons'] == [2015]
+    assert 2015 not in list_years(store)
+    assert not (read_cleaned_store([YEAR_COLUMN], store_path=store)[YEAR_COLUMN] == 2015).any()
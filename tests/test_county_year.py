@@ -0,0 +1,33 @@
+import os
+
+import pandas as pd
+
+from county_year import load_county_year
+from data_loading import CLEANED_FILE
+
+
+def test_cache_follows_the_csv_fallback(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = str(tmp_path / 'cache')
+    df = pd.DataFrame({
+        'Geography': ['Autauga', 'Autauga', 'Baldwin'],
+        'FIPS': [1001, 1001, 1003],
+        'Season/Survey Year': [2021, 2022, 2021],
+        'Estimate (%)': [40.0, 42.0, 50.0],
+        'ci_lower': [35.0, 37.0, 45.0],
+        'ci_upper': [45.0, 47.0, 55.0],
+        'Sample Size': [100, 120, 80],
+    })
+    df.to_csv(CLEANED_FILE, index=False)
+
+    # No store: the table and its cache key come from the cleaned CSV
+    first = load_county_year('missing_store', cache_dir=cache, verbose=False)
+    assert first['avg_rate'].tolist() == [40.0, 42.0, 50.0]
+    assert load_county_year('missing_store', cache_dir=cache, verbose=False).attrs['version'] == first.attrs['version']
+
+    df.loc[0, 'Estimate (%)'] = 30.0
+    df.to_csv(CLEANED_FILE, index=False)
+    second = load_county_year('missing_store', cache_dir=cache, verbose=False)
+    assert second.attrs['version'] != first.attrs['version']
+    assert second['avg_rate'].tolist() == [30.0, 42.0, 50.0]
+    assert os.listdir(cache) == [f"county_year-{second.attrs['version']}.parquet"]
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from data_loading import YEAR_COLUMN, read_cleaned_store, write_cleaned_store
+
+
+def test_chunked_store_keeps_input_order(tmp_path):
+    store = str(tmp_path / 'store')
+    rows = 12 * 50
+    df = pd.DataFrame({
+        YEAR_COLUMN: np.repeat([2021, 2022], rows // 2)[np.random.default_rng(0).permutation(rows)],
+        'FIPS': np.arange(rows),
+        'Estimate (%)': np.linspace(0, 100, rows),
+    })
+    # 12 chunks: part numbers of 10 and up must still read back after part 9
+    for part, start in enumerate(range(0, rows, 50)):
+        write_cleaned_store(df.iloc[start:start + 50], store, replace=(part == 0), part=part)
+
+    stored = read_cleaned_store(store_path=store)
+    for year, expected in df.groupby(YEAR_COLUMN):
+        got = stored[stored[YEAR_COLUMN] == year]
+        assert got['FIPS'].astype(int).tolist() == expected['FIPS'].tolist()
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from aggregate_tables import AGGREGATE_TABLES
+from benchmarks import make_synthetic_cleaned
+from data_aggregation import aggregate_flu_data
+from data_loading import YEAR_COLUMN, write_cleaned_store
+from stats_store import aggregates_from_store, update_stats_store
+
+
+def test_season_update_matches_a_full_rebuild(tmp_path):
+    store, partials = str(tmp_path / 'store'), str(tmp_path / 'partials')
+    names = list(AGGREGATE_TABLES)
+    df = make_synthetic_cleaned(20_000, seed=3)
+    write_cleaned_store(df, store)
+    aggregate_flu_data(store, verbose=False, stats_store=partials, tables=names)
+
+    # Revise the last season and merge only its partials
+    last = df[YEAR_COLUMN] == 2023
+    df.loc[last, 'Estimate (%)'] = np.round(np.random.default_rng(5).uniform(1, 90, last.sum()), 1)
+    write_cleaned_store(df[last], store, years=[2023])
+    update_stats_store([2023], store, partials)
+
+    merged = aggregates_from_store(names, partials)
+    full = aggregate_flu_data(store, verbose=False, tables=names)
+    for name in names:
+        # Bit-identical, in the same row order
+        pd.testing.assert_frame_equal(merged[name], full[name], check_exact=True)